@@ -5,9 +5,89 @@ Website: https://www.computervision.zone/
 """
 
 import math
+import threading
 import numpy as np
 import cv2
-from mediapipe import solutions
+
+
+# Bit positions in HandState.mask
+TIPS_UP = 0               # 5 bits, thumb to pinky
+TIPS_SIDE = 5             # 5 bits, thumb to pinky
+FINGERS_UP = 10
+FINGERS_SIDE = 11
+THUMB_RIGHT_POINT = 12
+THUMB_ABOVE_MID_TIP = 13
+NUM_STATE_BITS = 14
+
+
+def _comparisons(thumbUp):
+    """
+    Each row (a, b) of landmark/axis pairs sets its bit when landmark a < landmark b.
+    Axis 0 is x and axis 1 is y.
+    """
+    rows = [thumbUp]                                                  # tipsUp thumb
+    rows += [((tip, 1), (tip - 2, 1)) for tip in (8, 12, 16, 20)]     # tipsUp fingers
+    rows += [((4, 0), (3, 0))]                                        # tipsSide thumb
+    rows += [((tip - 2, 0), (tip, 0)) for tip in (8, 12, 16, 20)]     # tipsSide fingers
+    rows += [((4, 1), (18, 1)),                                       # fingersUp
+             ((4, 0), (18, 0)),                                       # fingersSide
+             ((4, 0), (12, 0)),                                       # thumbsRightPoint
+             ((3, 1), (12, 1))]                                       # thumbsAboveMidTip
+    lhs = np.array([a[0] * 3 + a[1] for a, b in rows])
+    rhs = np.array([b[0] * 3 + b[1] for a, b in rows])
+    return lhs, rhs
+
+
+_STATE_TABLES = {
+    "Left": _comparisons(((3, 0), (4, 0))),
+    "Right": _comparisons(((4, 0), (3, 0))),
+}
+_BIT_WEIGHTS = 1 << np.arange(NUM_STATE_BITS)
+
+
+class HandState:
+    """
+    Every finger and thumb comparison used by the gestures, computed in a
+    single vectorized pass and packed into an integer bitmask.
+    """
+    __slots__ = ('mask',)
+
+    def __init__(self, lmList, handType):
+        """
+        :param lmList: Landmarks of the hand, shape (21, 3)
+        :param handType: "Left" or "Right"
+        """
+        lhs, rhs = _STATE_TABLES["Left" if handType == "Left" else "Right"]
+        flat = np.asarray(lmList).reshape(-1)
+        self.mask = int((flat[lhs] < flat[rhs]) @ _BIT_WEIGHTS)
+
+    def bit(self, position):
+        return (self.mask >> position) & 1
+
+    @property
+    def tipsUp(self):
+        return [(self.mask >> i) & 1 for i in range(TIPS_UP, TIPS_UP + 5)]
+
+    @property
+    def tipsSide(self):
+        return [(self.mask >> i) & 1 for i in range(TIPS_SIDE, TIPS_SIDE + 5)]
+
+    @property
+    def fingersUp(self):
+        return self.bit(FINGERS_UP)
+
+    @property
+    def fingersSide(self):
+        return self.bit(FINGERS_SIDE)
+
+    @property
+    def thumbsRightPoint(self):
+        return self.bit(THUMB_RIGHT_POINT)
+
+    @property
+    def thumbsAboveMidTip(self):
+        return self.bit(THUMB_ABOVE_MID_TIP)
+
 
 class HandDetector:
     """
@@ -17,7 +97,8 @@ class HandDetector:
     provides bounding box info of the hand found.
     """
 
-    def __init__(self, staticMode=False, maxHands=2, modelComplexity=1, detectionCon=0.5, minTrackCon=0.5):
+    def __init__(self, staticMode=False, maxHands=2, modelComplexity=1, detectionCon=0.5, minTrackCon=0.5,
+                 roiMode=False, roiSize=256, roiMargin=0.5, roiRefresh=30, hands=None):
 
         """
         :param mode: In static mode, detection is done on each image: slower
@@ -25,24 +106,73 @@ class HandDetector:
         :param modelComplexity: Complexity of the hand landmark model: 0 or 1.
         :param detectionCon: Minimum Detection Confidence Threshold
         :param minTrackCon: Minimum Tracking Confidence Threshold
+        :param roiMode: Once a hand is found, only process a crop around it
+        :param roiSize: Longest side the ROI crop is downsized to
+        :param roiMargin: Margin added around the previous bbox, relative to its size
+        :param roiRefresh: Run a full frame detection every roiRefresh frames
+        :param hands: Graph whose process(imgRGB) returns the hands like MediaPipe does,
+                      a MediaPipe Hands graph is built when None
         """
         self.staticMode = staticMode
         self.maxHands = maxHands
         self.modelComplexity = modelComplexity
         self.detectionCon = detectionCon
         self.minTrackCon = minTrackCon
-        self.mpHands = solutions.hands
-        self.hands = self.mpHands.Hands(static_image_mode=self.staticMode,
-                                        max_num_hands=self.maxHands,
-                                        model_complexity=modelComplexity,
-                                        min_detection_confidence=self.detectionCon,
-                                        min_tracking_confidence=self.minTrackCon)
-
-        self.mpDraw = solutions.drawing_utils
+        self.mpHands = self.mpDraw = None
+        if hands is None:
+            # Imported here, importing this module stays cheap until a graph is built
+            from mediapipe import solutions
+            self.mpHands = solutions.hands
+            self.mpDraw = solutions.drawing_utils
+            hands = self.mpHands.Hands(static_image_mode=self.staticMode,
+                                       max_num_hands=self.maxHands,
+                                       model_complexity=modelComplexity,
+                                       min_detection_confidence=self.detectionCon,
+                                       min_tracking_confidence=self.minTrackCon)
+        elif roiMode:
+            raise ValueError('roiMode needs the MediaPipe graph, it runs a second one on the crops')
+        self.hands = hands
+
+        self.roiMode = roiMode
+        self.roiSize = roiSize
+        self.roiMargin = roiMargin
+        self.roiRefresh = roiRefresh
+        self.roiFrames = 0
+        self.roiHands = None
+        if roiMode:
+            # Separate graph so its tracking state stays in crop coordinates
+            self.roiHands = self.mpHands.Hands(static_image_mode=self.staticMode,
+                                               max_num_hands=self.maxHands,
+                                               model_complexity=modelComplexity,
+                                               min_detection_confidence=self.detectionCon,
+                                               min_tracking_confidence=self.minTrackCon)
+
         self.tipIds = [4, 8, 12, 16, 20]
         self.fingers = []
         self.lmList = []
 
+        # Landmarks of every hand in pixels. The buffers are reused, so the
+        # hand dicts returned by findHands are only valid until the next call
+        self.landmarks = np.zeros((self.maxHands, 21, 3), np.int32)
+        self.bboxes = np.zeros((self.maxHands, 4), np.int32)
+        self.numHands = 0
+        self.results = None
+        # Optional pipeline.StageProfiler of the loop using the detector
+        self.profiler = None
+        # Optional replay.LandmarkRecorder, gets the hands of every findHands call
+        self.recorder = None
+
+    def reset(self):
+        """
+        Forgets the hands of the previous frames, before handing the detector to another user.
+        """
+        self.numHands = 0
+        self.roiFrames = 0
+        self.lmList = []
+        self.results = None
+        self.profiler = None
+        self.recorder = None
+
     def findHands(self, img, draw=True, flipType=True, getLms=False):
         """
         Finds hands in a BGR image.
@@ -50,35 +180,49 @@ class HandDetector:
         :param draw: Flag to draw the output on the image.
         :return: Image with or without drawings
         """
-        imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        self.results = self.hands.process(imgRGB)
+        profiler = self.profiler
+        self.results = None
+        if self.roiMode and self.numHands and self.roiFrames < self.roiRefresh:
+            self.results = self.processRoi(img)
+            if profiler:
+                profiler.lap('roi')
+        if self.results is None:
+            self.roiFrames = 0
+            imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            if profiler:
+                profiler.lap('convert')
+            self.results = self.hands.process(imgRGB)
+            if profiler:
+                profiler.lap('detect')
         allHands = []
         h, w, c = img.shape
         handLms = None
+        self.numHands = 0
             
-        if self.results.multi_hand_landmarks:
-            for handType, handLms in zip(self.results.multi_handedness, self.results.multi_hand_landmarks):
-                myHand = {}
-                mylmList = []
-                xList = []
-                yList = []
-                for id, lm in enumerate(handLms.landmark):
-                    px, py, pz = int(lm.x * w), int(lm.y * h), int(lm.z * w)
-                    mylmList.append([px, py, pz])
-                    xList.append(px)
-                    yList.append(py)
-
-                ## bbox
-                xmin, xmax = min(xList), max(xList)
-                ymin, ymax = min(yList), max(yList)
-                boxW, boxH = xmax - xmin, ymax - ymin
-                bbox = xmin, ymin, boxW, boxH
-                cx, cy = bbox[0] + (bbox[2] // 2), \
-                         bbox[1] + (bbox[3] // 2)
-
-                myHand["lmList"] = mylmList
-                myHand["bbox"] = bbox
-                myHand["center"] = (cx, cy)
+        multiHandLms = self.results.multi_hand_landmarks or []
+        multiHandedness = self.results.multi_handedness or []
+            
+        if multiHandLms:
+            multiHandLms = multiHandLms[:self.maxHands]
+            n = self.numHands = len(multiHandLms)
+            points = np.array([[(lm.x, lm.y, lm.z) for lm in hand.landmark] for hand in multiHandLms])
+            points *= (w, h, w)
+            landmarks = self.landmarks[:n]
+            landmarks[:] = points
+
+            ## bbox, as xmin, ymin, xmax, ymax
+            bboxes = self.bboxes[:n]
+            bboxes[:, :2] = landmarks[:, :, :2].min(axis=1)
+            bboxes[:, 2:] = landmarks[:, :, :2].max(axis=1)
+
+            for i, (handType, handLms) in enumerate(zip(multiHandedness, multiHandLms)):
+                xmin, ymin, xmax, ymax = bboxes[i].tolist()
+                bbox = xmin, ymin, xmax - xmin, ymax - ymin
+                myHand = {
+                    "lmList": landmarks[i],
+                    "bbox": bbox,
+                    "center": (xmin + bbox[2] // 2, ymin + bbox[3] // 2),
+                }
 
                 if flipType:
                     if handType.classification[0].label == "Right":
@@ -91,39 +235,40 @@ class HandDetector:
 
                 ## draw
                 if draw:
-                    self.mpDraw.draw_landmarks(img, handLms, self.mpHands.HAND_CONNECTIONS)
+                    if self.mpDraw is not None:
+                        self.mpDraw.draw_landmarks(img, handLms, self.mpHands.HAND_CONNECTIONS)
                     cv2.rectangle(img, (bbox[0] - 20, bbox[1] - 20),
                                   (bbox[0] + bbox[2] + 20, bbox[1] + bbox[3] + 20),
                                   (255, 255, 255), 2)
                     cv2.putText(img, myHand["type"], (bbox[0] - 30, bbox[1] - 30), cv2.FONT_HERSHEY_PLAIN,
                                 2, (255, 255, 255), 2)
                     
+        if self.recorder is not None:
+            self.recorder.record(self.landmarks[:self.numHands], [hand["type"] for hand in allHands],
+                                 [handType.classification[0].score for handType in multiHandedness[:self.numHands]],
+                                 w, h)
+        if profiler:
+            profiler.lap('landmarks')
         if getLms:
             return allHands, img, handLms
         else:
             return allHands, img
     
     def findPosition(self, img, handNo=0, draw=True, drawTip=None):
-        xList = []
-        yList = []
+        """
+        Landmarks of one hand as [id, x, y], taken from the last findHands call.
+        :return: lmList and bbox as xmin, ymin, xmax, ymax
+        """
         bbox = []
         self.lmList = []
-        if self.results.multi_hand_landmarks:
-            myHand = self.results.multi_hand_landmarks[handNo]
-            for id, lm in enumerate(myHand.landmark):
-                h, w, c = img.shape
-                cx, cy = int(lm.x * w), int(lm.y * h)
-                xList.append(cx)
-                yList.append(cy)
-                self.lmList.append([id, cx, cy])
-                if draw:
-                    cv2.circle(img, (cx, cy), 5, (0, 0, 255), cv2.FILLED)
-
-            xmin, xmax = min(xList), max(xList)
-            ymin, ymax = min(yList), max(yList)
-            bbox = xmin, ymin, xmax, ymax
+        if handNo < self.numHands:
+            points = self.landmarks[handNo, :, :2].tolist()
+            self.lmList = [[id, x, y] for id, (x, y) in enumerate(points)]
+            xmin, ymin, xmax, ymax = bbox = tuple(self.bboxes[handNo].tolist())
 
             if draw:
+                for id, x, y in self.lmList:
+                    cv2.circle(img, (x, y), 5, (0, 0, 255), cv2.FILLED)
                 cv2.rectangle(img, (xmin - 20, ymin - 20), (xmax + 20, ymax + 20),
                               (255, 255, 255), 2)
             if drawTip:
@@ -132,111 +277,88 @@ class HandDetector:
                 
         return self.lmList, bbox
 
+    def processRoi(self, img):
+        """
+        Runs the landmark model on a downsized crop around the hands of the
+        previous frame and maps the landmarks back to the full image.
+        :return: MediaPipe results, or None when the hands were lost
+        """
+        h, w, c = img.shape
+        bboxes = self.bboxes[:self.numHands]
+        xmin, ymin = bboxes[:, :2].min(axis=0)
+        xmax, ymax = bboxes[:, 2:].max(axis=0)
+        side = max(xmax - xmin, ymax - ymin) * (1 + 2 * self.roiMargin)
+        cx, cy = (xmin + xmax) / 2, (ymin + ymax) / 2
+        x0, y0 = int(max(cx - side / 2, 0)), int(max(cy - side / 2, 0))
+        x1, y1 = int(min(cx + side / 2, w)), int(min(cy + side / 2, h))
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+
+        crop = img[y0:y1, x0:x1]
+        scale = self.roiSize / max(x1 - x0, y1 - y0)
+        if scale < 1:
+            crop = cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        results = self.roiHands.process(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+        if not results.multi_hand_landmarks:
+            return None
+
+        cropW, cropH = x1 - x0, y1 - y0
+        for handLms in results.multi_hand_landmarks:
+            for lm in handLms.landmark:
+                lm.x = (lm.x * cropW + x0) / w
+                lm.y = (lm.y * cropH + y0) / h
+                lm.z = lm.z * cropW / w
+        self.roiFrames += 1
+        return results
+
+    def handState(self, myHand):
+        """
+        HandState of a hand returned by findHands, computed on first use
+        and cached in the hand dict for the rest of the frame.
+        """
+        state = myHand.get("state")
+        if state is None:
+            state = myHand["state"] = HandState(myHand["lmList"], myHand["type"])
+        return state
+
     def tipsUp(self, myHand):
         """
         Finds how many fingers are open and returns in a list.
         Considers left and right hands separately
         :return: List of which fingers are up
         """
-        fingers = []
-        myHandType = myHand["type"]
-        myLmList = myHand["lmList"]
         if self.results.multi_hand_landmarks:
-
-            # Thumb
-            if myHandType == "Left":
-                if myLmList[self.tipIds[0]][0] > myLmList[self.tipIds[0] - 1][0]:
-                    fingers.append(1)
-                else:
-                    fingers.append(0)
-            else:
-                if myLmList[self.tipIds[0]][0] < myLmList[self.tipIds[0] - 1][0]:
-                    fingers.append(1)
-                else:
-                    fingers.append(0)
-
-            # 4 Fingers
-            for id in range(1, 5):
-                if myLmList[self.tipIds[id]][1] < myLmList[self.tipIds[id] - 2][1]:
-                    fingers.append(1)
-                else:
-                    fingers.append(0)
-        return fingers
+            return self.handState(myHand).tipsUp
+        return []
     
     def tipsSide(self, myHand):
-        fingers = []
-        myLmList = myHand["lmList"]
         if self.results.multi_hand_landmarks:
-
-            # Thumbs Up
-            if myLmList[self.tipIds[0]][0] < myLmList[self.tipIds[0] - 1][0]:
-                fingers.append(1)
-            else:
-                fingers.append(0)
-
-            # 4 Fingers Side right=1, left=0
-            for id in range(1, 5):
-                if myLmList[self.tipIds[id]][0] > myLmList[self.tipIds[id] - 2][0]:
-                    fingers.append(1)
-                else:
-                    fingers.append(0)
-        return fingers
+            return self.handState(myHand).tipsSide
+        return []
     
     def fingersUp(self, myHand):
-        fingers = []
-        myHandType = myHand["type"]
-        myLmList = myHand["lmList"]
+        # Thumb < pinky y
         if self.results.multi_hand_landmarks:
-
-            # Thumb < pinky y
-            if myLmList[self.tipIds[0]][1] < myLmList[self.tipIds[4] - 2][1]:
-                fingers = 1
-            else:
-                fingers = 0
-
-        return fingers
+            return self.handState(myHand).fingersUp
+        return []
     
     def fingersSide(self, myHand):
-        fingers = []
-        myHandType = myHand["type"]
-        myLmList = myHand["lmList"]
+        # Thumb < pinky x
         if self.results.multi_hand_landmarks:
-
-            # Thumb < pinky x
-            if myLmList[self.tipIds[0]][0] < myLmList[self.tipIds[4] - 2][0]:
-                fingers = 1
-            else:
-                fingers = 0
-
-        return fingers
+            return self.handState(myHand).fingersSide
+        return []
     
     def thumbsRightPoint(self, myHand):
-        fingers = []
-        myHandType = myHand["type"]
-        myLmList = myHand["lmList"]
+        # Thumb < mid x
         if self.results.multi_hand_landmarks:
-
-            # Thumb < mid y
-            if myLmList[self.tipIds[0]][0] < myLmList[self.tipIds[2]][0]:
-                fingers = 1
-            else:
-                fingers = 0
-
-        return fingers
+            return self.handState(myHand).thumbsRightPoint
+        return []
     
     def thumbsAboveMidTip(self, myHand):
-        fingers = []
-        myHandType = myHand["type"]
-        myLmList = myHand["lmList"]
+        # Thumb < mid y
         if self.results.multi_hand_landmarks:
-
-            # Thumb < mid y
-            if myLmList[self.tipIds[0] - 1][1] < myLmList[self.tipIds[2]][1]:
-                fingers = 1
-            else:
-                fingers = 0
-
-        return fingers
+            return self.handState(myHand).thumbsAboveMidTip
+        return []
 
     def findDistance(self, p1, p2, img=None, color=(255, 255, 255), scale=5):
         """
@@ -260,4 +382,72 @@ class HandDetector:
             cv2.line(img, (x1, y1), (x2, y2), color, max(1, scale // 3))
             cv2.circle(img, (cx, cy), scale, color, cv2.FILLED)
 
-        return length, info, img
\ No newline at end of file
+        return length, info, img
+
+    def close(self):
+        """
+        Shuts down the MediaPipe graphs. The detector can't be used afterwards.
+        """
+        for graph in (self.hands, self.roiHands):
+            if graph is not None:
+                graph.close()
+        self.hands = self.roiHands = None
+
+
+
+class HandDetectorPool:
+    """
+    Keeps built HandDetectors warm between users. Detectors are keyed by
+    the options baked into the MediaPipe graph, so a user always gets a
+    detector built with exactly the options it asked for.
+    """
+
+    def __init__(self):
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def key(self, staticMode, maxHands, modelComplexity, detectionCon, minTrackCon, roiMode):
+        return staticMode, maxHands, modelComplexity, detectionCon, minTrackCon, roiMode
+
+    def acquire(self, staticMode=False, maxHands=2, modelComplexity=1, detectionCon=0.5, minTrackCon=0.5,
+                roiMode=False):
+        """
+        Same parameters as HandDetector.
+        :return: An idle detector with that configuration, built if there is none
+        """
+        key = self.key(staticMode, maxHands, modelComplexity, detectionCon, minTrackCon, roiMode)
+        with self.lock:
+            detectors = self.idle.get(key)
+            detector = detectors.pop() if detectors else None
+        if detector is None:
+            detector = HandDetector(staticMode=staticMode, maxHands=maxHands, modelComplexity=modelComplexity,
+                                    detectionCon=detectionCon, minTrackCon=minTrackCon, roiMode=roiMode)
+        return detector
+
+    def release(self, detector):
+        """
+        Hands the detector back, it must not be used by the caller afterwards.
+        """
+        if detector is None:
+            return
+        detector.reset()
+        key = self.key(detector.staticMode, detector.maxHands, detector.modelComplexity, detector.detectionCon,
+                       detector.minTrackCon, detector.roiMode)
+        with self.lock:
+            self.idle.setdefault(key, []).append(detector)
+
+    def prewarm(self, **config):
+        """
+        Builds a detector for config ahead of time, if none is idle.
+        """
+        self.release(self.acquire(**config))
+
+    def close(self):
+        """
+        Closes every idle detector.
+        """
+        with self.lock:
+            detectors = [detector for detectors in self.idle.values() for detector in detectors]
+            self.idle.clear()
+        for detector in detectors:
+            detector.close()
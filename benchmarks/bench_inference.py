@@ -0,0 +1,51 @@
+"""
+Latency of the presentation key model: Keras predict (the old path)
+against the KeyModel backends.
+
+Run from the repository root:
+    python benchmarks/bench_inference.py [model/presentation_keys.h5] [iterations]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from inference import KeyModel, BatchingKeyModel
+
+
+def measure(predict, img, iterations):
+    predict(img)
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        predict(img)
+        durations.append(time.perf_counter() - start)
+    durations = np.array(durations) * 1000
+    return f"mean {durations.mean():7.2f} ms  p50 {np.percentile(durations, 50):7.2f} ms  " \
+           f"p95 {np.percentile(durations, 95):7.2f} ms"
+
+
+def main():
+    model_path = sys.argv[1] if len(sys.argv) > 1 else 'model/presentation_keys.h5'
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (256, 256, 3), dtype=np.uint8)
+
+    keras_model = KeyModel(model_path, backend='keras')
+    print('keras predict    ', measure(lambda x: keras_model.backend.model.predict(np.expand_dims(x / 255, 0),
+                                                                                  verbose=0), img, iterations))
+    print('keras direct call', measure(keras_model.predict, img, iterations))
+    print('keras batching   ', measure(BatchingKeyModel(keras_model).predict, img, iterations))
+
+    if os.path.exists(os.path.splitext(model_path)[0] + '.tflite'):
+        tflite_model = KeyModel(model_path, backend='tflite')
+        print('tflite           ', measure(tflite_model.predict, img, iterations))
+    else:
+        print(f'tflite            skipped, run "python inference.py export {model_path}" first')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+Micro-benchmarks of the helpers on the per-frame and quiz editing paths,
+on synthetic landmarks, images and quiz banks: no camera, MediaPipe or
+key model needed.
+
+Each benchmark is calibrated to run for at least --min-time per sample,
+then sampled --repeats times with the garbage collector off. The median
+time per call is what --compare gates on.
+    python benchmarks/bench_micro.py [--filter text] [--save results.json]
+    python benchmarks/bench_micro.py --compare baseline.json [results.json] [--threshold 0.1]
+Without a results file, --compare runs the benchmarks first. It exits with
+status 1 when a benchmark got slower than the baseline by more than the
+threshold (a fraction of the baseline median).
+"""
+
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The app loads its ui files and quizzes relative to the working directory
+os.chdir(ROOT)
+
+import cv2
+import numpy as np
+from PyQt5.QtCore import QT_VERSION_STR
+from PyQt5.QtGui import QImage
+from PyQt5.QtWidgets import QApplication
+
+import composite
+from HandTrackingModule import HandDetector, HandState
+from gesture_classifier import LandmarkClassifier, normalize_landmarks
+from image_cache import fit_pixmap
+from inference import KeyModel, KEY_LABELS
+from pipeline import fit_size, StageProfiler
+from quiz_store import QuizStore, QuizCatalog, QUIZ_FIELDS
+
+
+PREDICATES = ['tipsUp', 'tipsSide', 'fingersUp', 'fingersSide', 'thumbsRightPoint', 'thumbsAboveMidTip']
+BANK_SIZES = [100, 5000]
+FRAME_SIZE = (640, 480)
+
+
+def synthetic_hand(rng, center=(320, 300), size=160):
+    """
+    :return: Open hand as 21 [x, y, z] landmarks in pixels, with some jitter
+    """
+    points = [(0.0, 0.0)]
+    for finger in range(5):
+        angle = np.radians(-150 + finger * 30)
+        length = 0.6 if finger == 0 else 0.9 - abs(finger - 2.5) * 0.1
+        for joint in range(1, 5):
+            r = length * joint / 4
+            points.append((r * np.cos(angle), r * np.sin(angle)))
+    points = np.array(points) * size + center
+    points += rng.normal(0, 3, points.shape)
+    z = rng.normal(0, 10, (21, 1))
+    return np.hstack([points, z]).astype(np.int32)
+
+
+def graph_results(hands, width, height):
+    """
+    :return: What the MediaPipe hands graph returns for the given pixel landmarks
+    """
+    return SimpleNamespace(
+        multi_hand_landmarks=[
+            SimpleNamespace(landmark=[SimpleNamespace(x=x / width, y=y / height, z=z / width) for x, y, z in hand])
+            for hand in hands],
+        multi_handedness=[
+            SimpleNamespace(classification=[SimpleNamespace(label=label, score=0.97)])
+            for label in ('Right', 'Left')[:len(hands)]],
+    )
+
+
+def synthetic_detector(results, maxHands=2):
+    """
+    :return: HandDetector whose graph returns the same hands on every frame, so
+             findHands only costs the color conversion and the post-processing
+    """
+    graph = SimpleNamespace(process=lambda imgRGB: results, close=lambda: None)
+    return HandDetector(maxHands=maxHands, hands=graph)
+
+
+def write_bank(store, name, size, rng):
+    store.create_quiz(name)
+    with store.lock, store.connection:
+        quiz_id = store.quiz_id(name)
+        store.connection.executemany(
+            f'INSERT INTO questions (quiz_id, position, {", ".join(QUIZ_FIELDS)}) '
+            f'VALUES (?, ?{", ?" * len(QUIZ_FIELDS)})',
+            ([quiz_id, position, f'Question {position} ' + 'x' * int(rng.integers(20, 200)), '', 'text',
+              str(int(rng.integers(1, 5)))] + [f'Choice {choice} of {position}' for choice in range(1, 5)]
+             for position in range(1, size + 1)))
+    store.export_csv(name)
+
+
+def benchmarks(workdir):
+    """
+    :return: Dict of benchmark name to a function taking no arguments
+    """
+    rng = np.random.default_rng(0)
+    width, height = FRAME_SIZE
+    frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    right, left = synthetic_hand(rng), synthetic_hand(rng, center=(200, 320))
+    cases = {}
+
+    for count, hands in ((1, [right]), (2, [right, left])):
+        detector = synthetic_detector(graph_results(hands, width, height))
+        cases[f'findHands.{count}hand'] = lambda detector=detector: detector.findHands(frame, draw=False)
+
+    detector = synthetic_detector(graph_results([right], width, height))
+    hand = detector.findHands(frame, draw=False)[0][0]
+    cases['HandState'] = lambda: HandState(hand['lmList'], hand['type'])
+    for name in PREDICATES:
+        # The first predicate of a frame builds the HandState, the others read it from the hand dict
+        cases[f'predicate.{name}.first'] = lambda name=name: getattr(HandState(hand['lmList'], hand['type']), name)
+        cases[f'predicate.{name}.cached'] = lambda name=name: getattr(detector, name)(hand)
+    cases['GestureRules.match'] = lambda: composite.gestures.match('presentation_keys', detector.handState(hand),
+                                                                   hand['type'])
+
+    presentation = composite.Presentation()
+    presentation.profiler = StageProfiler('bench')
+    skeleton = np.zeros_like(frame)
+    for a, b in zip(range(20), range(1, 21)):
+        cv2.line(skeleton, tuple(right[a, :2].tolist()), tuple(right[b, :2].tolist()), (255, 255, 255), 2)
+    cases['Presentation.crop_bbox'] = lambda: presentation.crop_bbox(hand, skeleton)
+    crop = presentation.crop_bbox(hand, skeleton)
+    model_input = np.empty((1, presentation.img_size, presentation.img_size, 3), np.float32)
+    # preprocess doesn't touch the backend, so no model has to be loaded
+    key_model = KeyModel.__new__(KeyModel)
+    cases['KeyModel.preprocess'] = lambda: key_model.preprocess(crop, model_input)
+    cases['normalize_landmarks'] = lambda: normalize_landmarks(hand['lmList'])
+    samples = np.stack([normalize_landmarks(synthetic_hand(rng)) for _ in range(len(KEY_LABELS) * 10)])
+    presentation.landmark_model = LandmarkClassifier.fit(samples, np.repeat(KEY_LABELS, 10))
+    cases['Presentation.key_prediction.landmarks'] = lambda: presentation.key_prediction(hand, frame, None)
+
+    for size, label in (((1920, 1080), 'fhd'), ((640, 480), 'vga')):
+        image = QImage(*size, QImage.Format_RGB888)
+        image.fill(0x336699)
+        cases[f'fit_pixmap.{label}'] = lambda image=image: fit_pixmap(image, 300, 400)
+    cases['fit_size'] = lambda: fit_size(1920, 1080, 400, 300)
+
+    store = QuizStore(workdir)
+    composite.quiz_store, composite.quiz_catalog = store, QuizCatalog(store)
+    quiz = composite.Quiz()
+    for size in BANK_SIZES:
+        name = f'bank{size}'
+        write_bank(store, name, size, rng)
+
+        def import_cold(name=name):
+            store.import_csv(name)
+            quiz.import_quiz_data(name)
+
+        cases[f'Quiz.import_quiz_data.cold.{size}'] = import_cold
+        cases[f'Quiz.import_quiz_data.warm.{size}'] = lambda name=name: quiz.import_quiz_data(name)
+
+        edit = composite.QuizEdit()
+        edit.comboBox.setCurrentText(name)
+        edit.label_11.setText(str(size // 2))
+        edit.load_question()
+        cases[f'QuizEdit.save_inputs.{size}'] = edit.save_inputs
+
+        def save_flush(edit=edit):
+            edit.save_inputs()
+            store.flush()
+
+        cases[f'QuizEdit.save_inputs+flush.{size}'] = save_flush
+    return cases
+
+
+def calibrate(function, min_time):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return number
+        number = max(number * 2, int(number * min_time / elapsed * 1.2) if elapsed else number * 10)
+
+
+def measure(function, repeats, min_time):
+    function()
+    number = calibrate(function, min_time)
+    samples = []
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            samples.append((time.perf_counter() - start) / number * 1e6)
+    finally:
+        if enabled:
+            gc.enable()
+    return {
+        'number': number,
+        'repeats': repeats,
+        'min_us': min(samples),
+        'median_us': statistics.median(samples),
+        'mean_us': statistics.mean(samples),
+        'stdev_us': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'qt': QT_VERSION_STR,
+    }
+
+
+def run(name_filter=None, repeats=15, min_time=0.02):
+    app = QApplication.instance() or QApplication(sys.argv)
+    workdir = tempfile.mkdtemp(prefix='bench_micro-')
+    store, catalog = composite.quiz_store, composite.quiz_catalog
+    try:
+        cases = benchmarks(workdir)
+        results = {}
+        print(f"{'benchmark':<42} {'median':>12} {'min':>12} {'stdev':>10}")
+        for name, function in cases.items():
+            if name_filter and name_filter not in name:
+                continue
+            result = results[name] = measure(function, repeats, min_time)
+            print(f"{name:<42} {result['median_us']:10.2f}us {result['min_us']:10.2f}us "
+                  f"{result['stdev_us']:8.2f}us")
+            app.processEvents()
+    finally:
+        composite.quiz_store, composite.quiz_catalog = store, catalog
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {'environment': environment(), 'results': results}
+
+
+def compare(baseline, current, threshold):
+    """
+    :return: Names of the benchmarks slower than the baseline by more than threshold
+    """
+    regressions = []
+    print(f"{'benchmark':<42} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<42} {'':>12} {result['median_us']:10.2f}us      new")
+            continue
+        change = result['median_us'] / base['median_us'] - 1
+        mark = ''
+        if change > threshold:
+            regressions.append(name)
+            mark = '  REGRESSION'
+        print(f"{name:<42} {base['median_us']:10.2f}us {result['median_us']:10.2f}us {change:+7.1%}{mark}")
+    missing = baseline['results'].keys() - current['results'].keys()
+    if missing:
+        print(f'{len(missing)} baseline benchmarks were not run')
+    if baseline['environment'].get('platform') != current['environment'].get('platform'):
+        print('Warning: the results come from different platforms')
+    print(f'{len(regressions)} regressions over {threshold:.0%}')
+    return regressions
+
+
+def option(args, name, default=None):
+    if name not in args:
+        return default
+    i = args.index(name)
+    value = args[i + 1]
+    del args[i:i + 2]
+    return value
+
+
+def main():
+    args = sys.argv[1:]
+    name_filter = option(args, '--filter')
+    save_path = option(args, '--save')
+    baseline_path = option(args, '--compare')
+    threshold = float(option(args, '--threshold', 0.1))
+    repeats = int(option(args, '--repeats', 15))
+    min_time = float(option(args, '--min-time', 0.02))
+
+    if baseline_path and args:
+        with open(args[0]) as file:
+            current = json.load(file)
+    else:
+        current = run(name_filter, repeats, min_time)
+    if save_path:
+        with open(save_path, 'w') as file:
+            json.dump(current, file, indent=2)
+        print(f'Saved {save_path}')
+
+    if baseline_path:
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        return 1 if compare(baseline, current, threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
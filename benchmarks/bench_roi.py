@@ -0,0 +1,46 @@
+"""
+Frames per second of HandDetector with and without ROI tracking.
+
+Needs a recording with a hand in view, e.g. captured from the webcam:
+    python benchmarks/bench_roi.py hand.mp4 [frames]
+"""
+
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from HandTrackingModule import HandDetector
+
+
+def measure(video_path, frames, **detector_args):
+    detector = HandDetector(maxHands=1, **detector_args)
+    capture = cv2.VideoCapture(video_path)
+    processed = found = 0
+    elapsed = 0.0
+    while processed < frames:
+        success, img = capture.read()
+        if not success:
+            break
+        img = cv2.flip(img, 1)
+        start = time.perf_counter()
+        hands, img = detector.findHands(img, draw=False)
+        elapsed += time.perf_counter() - start
+        processed += 1
+        found += bool(hands)
+    capture.release()
+    return processed / elapsed if elapsed else 0.0, found, processed
+
+
+def main():
+    video_path = sys.argv[1]
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    for name, args in (('full frame', {}), ('roi', {'roiMode': True})):
+        fps, found, processed = measure(video_path, frames, **args)
+        print(f'{name:10} {fps:7.1f} fps  hand found in {found}/{processed} frames')
+
+
+if __name__ == "__main__":
+    main()
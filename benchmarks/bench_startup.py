@@ -0,0 +1,73 @@
+"""
+Time to first window: starts the app in a fresh interpreter, offscreen,
+until the main menu has been shown and painted, and reports the median
+over several runs. Also reports when the background PresentationLoader
+finished, i.e. how long after startup presentation mode is ready.
+    python benchmarks/bench_startup.py [runs]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication, QStackedWidget
+from PyQt5.QtCore import QTimer
+app = QApplication(sys.argv)
+import composite
+imported = time.perf_counter()
+composite.widget = QStackedWidget()
+composite.navigator = composite.Navigator(composite.widget)
+composite.navigator.show(composite.MainWindow)
+composite.widget.show()
+app.processEvents()
+shown = time.perf_counter()
+QTimer.singleShot(0, composite.presentation_loader.load_async)
+app.processEvents()
+try:
+    composite.presentation_loader.get()
+    loaded = time.perf_counter() - start
+except Exception as e:
+    loaded = None
+    print(f'Presentation loader failed: {e}', file=sys.stderr)
+print(json.dumps({'import': imported - start, 'shown': shown - start, 'loaded': loaded}))
+"""
+
+
+def run_once():
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen', CAMERA_SOURCE='synthetic')
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    total = time.perf_counter() - start
+    result = json.loads(output.strip().splitlines()[-1])
+    # Interpreter startup is only visible from outside the child
+    result['process'] = total
+    return result
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [run_once() for _ in range(runs)]
+
+    def median_ms(key):
+        values = [result[key] for result in results if result[key] is not None]
+        return f'{statistics.median(values) * 1000:8.1f} ms' if values else '     n/a'
+
+    print(f'{runs} runs, medians since interpreter start:')
+    print(f'  import composite          {median_ms("import")}')
+    print(f'  first window shown        {median_ms("shown")}')
+    print(f'  presentation mode ready   {median_ms("loaded")}')
+    print(f'  whole process (w/ exit)   {median_ms("process")}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Time to build the screens with uic.loadUi versus the compiled forms.
+
+"first" is the first construction of every screen, as at startup: for the
+compiled forms it includes importing the generated modules (compiling them
+too if they are stale). "navigation" is the mean time of each following
+construction, which is what a screen switch pays.
+    python benchmarks/bench_ui.py [repeats]
+"""
+
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from PyQt5.QtWidgets import QApplication, QWidget
+from PyQt5.uic import loadUi
+
+import ui_forms
+
+
+FORMS = ['main_window', 'quiz_menu', 'quiz', 'quiz_finish', 'quiz_edit', 'new_quiz']
+
+
+def build_loadui(name):
+    page = QWidget()
+    loadUi(ui_forms.ui_path(name), page)
+    return page
+
+
+def build_compiled(name):
+    page = QWidget()
+    ui = ui_forms.ui_form(name)()
+    ui.setupUi(page)
+    return page
+
+
+def measure(build, repeats):
+    first = {}
+    for name in FORMS:
+        start = time.perf_counter()
+        build(name).deleteLater()
+        first[name] = time.perf_counter() - start
+
+    navigation = {}
+    for name in FORMS:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            build(name).deleteLater()
+        navigation[name] = (time.perf_counter() - start) / repeats
+        QApplication.processEvents()
+    return first, navigation
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    app = QApplication(sys.argv)
+
+    results = {
+        'loadUi': measure(build_loadui, repeats),
+        'compiled': measure(build_compiled, repeats),
+    }
+    print(f"{'form':<12} {'loadUi first':>13} {'compiled first':>15} {'loadUi nav':>11} {'compiled nav':>13}")
+    for name in FORMS:
+        print(f"{name:<12} "
+              f"{results['loadUi'][0][name] * 1000:11.2f}ms {results['compiled'][0][name] * 1000:13.2f}ms "
+              f"{results['loadUi'][1][name] * 1000:9.2f}ms {results['compiled'][1][name] * 1000:11.2f}ms")
+    for method, (first, navigation) in results.items():
+        print(f'{method}: all screens first {sum(first.values()) * 1000:.1f} ms, '
+              f'mean screen switch {sum(navigation.values()) / len(FORMS) * 1000:.2f} ms')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Soak test of the page navigation: runs the menu -> quiz -> menu -> editor
+cycle many times and reports the resident memory, thread count and number
+of pages in the stack as it goes. All three should stay flat once warmed up.
+
+Runs offscreen on the synthetic camera, from the repository root:
+    python benchmarks/soak_navigation.py [cycles] [--max-growth MB]
+Exits with status 1 when RSS grew by more than --max-growth (default 50 MB)
+between the end of the warmup and the last cycle.
+"""
+
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ.setdefault('CAMERA_SOURCE', 'synthetic')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The app loads its ui files, model and quizzes relative to the working directory
+os.chdir(ROOT)
+
+from PyQt5.QtCore import QEvent
+from PyQt5.QtWidgets import QApplication, QStackedWidget
+
+import composite
+
+
+def process_status():
+    """
+    :return: Resident set size in MB and number of threads of this process
+    """
+    try:
+        import psutil
+    except ImportError:
+        values = {}
+        with open('/proc/self/status') as file:
+            for line in file:
+                key, _, value = line.partition(':')
+                values[key] = value.split()
+        return int(values['VmRSS'][0]) / 1024, int(values['Threads'][0])
+    process = psutil.Process()
+    return process.memory_info().rss / 2 ** 20, process.num_threads()
+
+
+def pump(app, seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        app.processEvents()
+        # Outside exec_() the deleteLater() of the closed pages is only run when asked for
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
+        time.sleep(0.005)
+
+
+def cycle(app, navigator, quiz_seconds):
+    quiz_menu = navigator.show(composite.QuizMenu)
+    pump(app, 0.01)
+    quiz_menu.to_quiz_window()
+    # Let the Quiz thread open the camera and run a few detections
+    pump(app, quiz_seconds)
+    navigator.current().to_quiz_menu()
+    pump(app, 0.01)
+    quiz_menu.to_quiz_edit()
+    pump(app, 0.01)
+    navigator.current().to_quiz_menu()
+    quiz_menu.to_main_window()
+    pump(app, 0.01)
+
+
+def main():
+    args = sys.argv[1:]
+    max_growth = 50.0
+    if '--max-growth' in args:
+        i = args.index('--max-growth')
+        max_growth = float(args[i + 1])
+        del args[i:i + 2]
+    cycles = int(args[0]) if args else 300
+    warmup = max(1, min(20, cycles // 5))
+
+    app = QApplication(sys.argv)
+    composite.widget = QStackedWidget()
+    composite.navigator = navigator = composite.Navigator(composite.widget)
+    navigator.show(composite.MainWindow)
+    composite.widget.show()
+
+    baseline = None
+    start = time.perf_counter()
+    print(f"{'cycle':>6} {'rss MB':>8} {'threads':>8} {'pages':>6}")
+    for i in range(1, cycles + 1):
+        cycle(app, navigator, quiz_seconds=0.1)
+        if i == warmup:
+            baseline = process_status()[0]
+        if i % 25 == 0 or i == cycles:
+            rss, threads = process_status()
+            print(f'{i:6d} {rss:8.1f} {threads:8d} {composite.widget.count():6d}')
+
+    navigator.shutdown()
+    rss, threads = process_status()
+    growth = rss - baseline
+    print(f'{cycles} cycles ({cycles * 6} navigations) in {time.perf_counter() - start:.1f} s, '
+          f'RSS growth after warmup: {growth:+.1f} MB')
+    return 1 if growth > max_growth else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
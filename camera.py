@@ -0,0 +1,292 @@
+"""
+Camera capture running on its own thread so inference never throttles it.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+CameraInfo = namedtuple('CameraInfo', ['index', 'width', 'height', 'fps'])
+
+
+class CameraStream:
+    """
+    Owns a cv2.VideoCapture and keeps grabbing frames into a small
+    preallocated ring buffer. Consumers always get the newest frame as a
+    view into the ring, without copying, so they have to transform or
+    copy it (cv2.flip does) before the ring wraps around.
+
+    When a grab fails the thread keeps retrying with a growing delay, and
+    a video file is rewound, so it loops. Meanwhile read() waits out its
+    timeout instead of returning at once.
+    """
+
+    def __init__(self, capture, slots=3, max_backoff=1.0):
+        """
+        :param capture: Opened cv2.VideoCapture (or anything with the same read/get/release API)
+        :param slots: Number of frames in the ring buffer
+        :param max_backoff: Longest delay in seconds between retries of a failing capture
+        """
+        self.capture = capture
+        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = capture.get(cv2.CAP_PROP_FPS)
+        self.slots = slots
+        self.max_backoff = max_backoff
+        self.ring = np.zeros((slots, self.height, self.width, 3), np.uint8)
+
+        self.condition = threading.Condition()
+        self.sequence = -1
+        self.read_sequence = -1
+        self.timestamp = 0.0
+        # time.perf_counter() at the capture of each ring slot, and of the frame read() returned last
+        self.timestamps = np.zeros(slots)
+        self.read_timestamp = 0.0
+        # True while grabbing fails
+        self.failed = False
+        self.running = False
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """
+        Starts the capture thread, does nothing if it is already running.
+        """
+        if self.thread is None or not self.thread.is_alive():
+            self.running = True
+            self.failed = False
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.update, name='CameraStream', daemon=True)
+            self.thread.start()
+        return self
+
+    def update(self):
+        sequence = self.sequence + 1
+        failures = 0
+        while self.running:
+            slot = sequence % self.slots
+            success, frame = self.capture.read(self.ring[slot])
+            if not success:
+                failures += 1
+                self.failed = True
+                self.recover(failures)
+                continue
+            failures = 0
+            self.failed = False
+
+            if frame.shape != self.ring.shape[1:]:
+                # The driver changed resolution, reallocate the ring to match
+                self.height, self.width = frame.shape[:2]
+                self.ring = np.zeros((self.slots, self.height, self.width, 3), np.uint8)
+                self.ring[slot] = frame
+
+            with self.condition:
+                self.sequence = sequence
+                self.timestamp = self.timestamps[slot] = time.perf_counter()
+                self.condition.notify_all()
+            sequence += 1
+        self.running = False
+
+    def recover(self, failures):
+        """
+        Rewinds a video file that reached its end, otherwise waits longer
+        after each consecutive failure before the next grab.
+        """
+        if failures == 1 and self.capture.get(cv2.CAP_PROP_FRAME_COUNT) > 0:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            return
+        self.stopping.wait(min(0.01 * 2 ** failures, self.max_backoff))
+
+    def read(self, timeout=1.0):
+        """
+        Waits for a frame newer than the one returned by the previous call.
+        :param timeout: Seconds to wait for a new frame
+        :return: success flag and the newest frame (a view into the ring), False after the timeout
+        """
+        if self.thread is None:
+            self.start()
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > self.read_sequence, timeout)
+            if self.sequence <= self.read_sequence:
+                return False, None
+            self.read_sequence = self.sequence
+            self.read_timestamp = self.timestamps[self.sequence % self.slots]
+            return True, self.ring[self.sequence % self.slots]
+
+    def stop(self):
+        self.running = False
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def release(self):
+        self.stop()
+        self.capture.release()
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+
+class SyntheticCapture:
+    """
+    Stand-in for cv2.VideoCapture that draws a moving blob on a dark
+    background, used to run the app and benchmarks without a camera.
+    """
+
+    def __init__(self, width=640, height=480, fps=30):
+        """
+        :param fps: Frames per second to pace reads at, 0 returns frames as fast as possible
+        """
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frame_count = 0
+        self.opened = True
+        self.last_read = 0.0
+
+    def read(self, image=None):
+        if not self.opened:
+            return False, None
+        if self.fps:
+            delay = self.last_read + 1 / self.fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.last_read = time.perf_counter()
+
+        if image is None or image.shape != (self.height, self.width, 3):
+            image = np.empty((self.height, self.width, 3), np.uint8)
+        image[:] = 40
+        angle = self.frame_count / 30
+        center = (int(self.width / 2 + math.cos(angle) * self.width / 4),
+                  int(self.height / 2 + math.sin(angle) * self.height / 4))
+        cv2.circle(image, center, self.height // 10, (200, 200, 200), cv2.FILLED)
+        self.frame_count += 1
+        return True, image
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.width
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.height
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0
+
+    def set(self, prop, value):
+        return False
+
+    def isOpened(self):
+        return self.opened
+
+    def release(self):
+        self.opened = False
+
+
+class CameraRegistry:
+    """
+    Finds cameras lazily and shares a single CameraStream between the
+    Presentation and Quiz threads. Nothing is opened until a mode asks
+    for a camera, and it is released when the last user is done.
+
+    The CAMERA_SOURCE environment variable overrides discovery: a camera
+    index, a video file path or "synthetic".
+    """
+
+    def __init__(self, max_index=4, source=None):
+        """
+        :param max_index: Number of camera indices to probe
+        :param source: Same values as CAMERA_SOURCE
+        """
+        self.max_index = max_index
+        self.source = source if source is not None else os.environ.get('CAMERA_SOURCE')
+        self.cameras = None
+        self.lock = threading.RLock()
+        self.discovery = None
+        self.stream = None
+        self.users = 0
+
+    def probe(self, index):
+        capture = cv2.VideoCapture(index)
+        try:
+            if not capture.isOpened():
+                return None
+            return CameraInfo(index,
+                              int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                              int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                              capture.get(cv2.CAP_PROP_FPS))
+        finally:
+            capture.release()
+
+    def discover_async(self):
+        """
+        Starts probing the camera indices in the background.
+        :return: Future resolving to the list of CameraInfo
+        """
+        with self.lock:
+            if self.discovery is None:
+                executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='CameraDiscovery')
+                self.discovery = executor.submit(self.run_discovery)
+                executor.shutdown(wait=False)
+        return self.discovery
+
+    def run_discovery(self):
+        # Every index is probed at once, opening a missing camera can take a while
+        with ThreadPoolExecutor(max_workers=self.max_index, thread_name_prefix='CameraProbe') as probes:
+            cameras = [info for info in probes.map(self.probe, range(self.max_index)) if info]
+        # Prefer the highest index, external webcams come after the built-in one
+        cameras.sort(key=lambda info: info.index, reverse=True)
+        self.cameras = cameras
+        return cameras
+
+    def discover(self):
+        """
+        :return: Cached list of CameraInfo, probing the devices on the first call
+        """
+        if self.cameras is None:
+            self.discover_async().result()
+        return self.cameras
+
+    def open_capture(self):
+        if self.source == 'synthetic':
+            return SyntheticCapture()
+        if self.source:
+            source = int(self.source) if self.source.isdigit() else self.source
+            capture = cv2.VideoCapture(source)
+            return capture if capture.isOpened() else None
+
+        for info in self.discover():
+            capture = cv2.VideoCapture(info.index)
+            if capture.isOpened():
+                return capture
+        return None
+
+    def acquire(self):
+        """
+        :return: Shared CameraStream, or None if no camera could be opened
+        """
+        with self.lock:
+            if self.stream is None:
+                capture = self.open_capture()
+                if capture is None:
+                    return None
+                self.stream = CameraStream(capture)
+            self.users += 1
+            return self.stream
+
+    def release(self, stream):
+        with self.lock:
+            if stream is None or stream is not self.stream:
+                return
+            self.users -= 1
+            if self.users == 0:
+                self.stream.release()
+                self.stream = None
@@ -1,62 +1,160 @@
 import sys
 import os
-import shutil
 import math
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-import csv
 import cv2
-from mediapipe import solutions
-from pynput.mouse import Button, Controller as MouseController
-from pynput.keyboard import Key, Controller as KeyboardController
-from screeninfo import get_monitors
-from tensorflow.keras.models import load_model
-from PyQt5 import QtWidgets
+from PyQt5 import QtWidgets, sip
 from PyQt5.QtWidgets import QApplication, QWidget, QFileDialog
 from PyQt5.QtGui import QPixmap, QImage, QIcon
-from PyQt5.uic import loadUi
-from PyQt5.QtCore import Qt, QObject, QThread, pyqtSignal, pyqtSlot
-from HandTrackingModule import HandDetector
-
-
-for i in range(3, -1, -1):
-    video = cv2.VideoCapture(i)
-    if video.isOpened():
-        wCam = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
-        hCam = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        wh_ratio = wCam/hCam
-        available_camera = i
-        break
-
-def fit_pixmap(pixmap, label_height, label_width):
-    width = pixmap.width()
-    height = pixmap.height()
-    pixmap_aspect_ratio = height / width
-    label_aspect_ratio = label_height / label_width
-    
-    if pixmap_aspect_ratio > label_aspect_ratio:
-        k = label_height / height
-        w_cal = math.floor(k * width)
-        img_resize = pixmap.scaled(w_cal, label_height)
-        
-    elif pixmap_aspect_ratio <= label_aspect_ratio:
-        k = label_width / width
-        h_cal = math.floor(k * height)
-        img_resize = pixmap.scaled(label_width, h_cal)
-        
-    return img_resize
+from PyQt5.QtCore import Qt, QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+from HandTrackingModule import HandDetectorPool
+from pipeline import FramePresenter, StageProfiler, LatencyTracker, DetectionGovernor, GestureConfirmer
+from camera import CameraRegistry
+from gesture_rules import GestureRules
+from inference import KeyModel, KEY_LABELS
+from gesture_classifier import LandmarkClassifier, LANDMARK_MODEL_PATH
+from image_cache import ImageCache, ImagePrefetcher
+from image_ingest import ImageIngest
+from quiz_store import QuizStore, QuizCatalog
+from ui_forms import ui_form
+from replay import LandmarkRecorder
+
+
+cameras = CameraRegistry()
+gestures = GestureRules.load('gestures.json')
+image_cache = ImageCache()
+image_prefetcher = ImagePrefetcher(image_cache)
+image_ingest = ImageIngest()
+quiz_store = QuizStore()
+quiz_catalog = QuizCatalog(quiz_store)
+# Presentation and Quiz configurations, kept warm across mode switches
+# ROI tracking is opt-in with HAND_ROI=1, measure it with benchmarks/bench_roi.py on your camera first
+PRESENTATION_DETECTOR = dict(maxHands=1, roiMode=os.environ.get('HAND_ROI') == '1')
+QUIZ_DETECTOR = dict(detectionCon=0.8, maxHands=2)
+detector_pool = HandDetectorPool()
+
+
+class PresentationLoader:
+    """
+    Loads the key model, warms a hand detector and imports the libraries
+    only presentation mode needs (pynput, screeninfo, TensorFlow), once per
+    run: in the background after the menu is shown, or when presentation
+    mode is first entered if that hasn't finished yet.
+    """
+
+    def __init__(self, model_path="model/presentation_keys.h5", img_size=256):
+        self.model_path = model_path
+        self.img_size = img_size
+        self.lock = threading.Lock()
+        self.future = None
+
+    def load_async(self):
+        """
+        :return: Future resolving to the key model
+        """
+        with self.lock:
+            if self.future is not None:
+                return self.future
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='PresentationLoader')
+            future = self.future = executor.submit(self.load)
+            executor.shutdown(wait=False)
+        future.add_done_callback(self.load_done)
+        return future
+
+    def load_done(self, future):
+        # A failed load isn't kept, so the next one tries again
+        if future.exception() is not None:
+            with self.lock:
+                if self.future is future:
+                    self.future = None
+
+    def load(self):
+        # Warms the import cache, the modules are imported again where they are used
+        import pynput.mouse, pynput.keyboard, screeninfo
+        detector_pool.prewarm(**PRESENTATION_DETECTOR)
+
+        if os.path.exists(LANDMARK_MODEL_PATH):
+            return LandmarkClassifier.load(LANDMARK_MODEL_PATH)
+        model = KeyModel(self.model_path, img_size=self.img_size)
+        # The first call traces the graph
+        model.predict(np.zeros((self.img_size, self.img_size, 3), np.uint8))
+        return model
+
+    def get(self):
+        return self.load_async().result()
 
 
-class MainWindow(QWidget):
+presentation_loader = PresentationLoader()
+
+
+class Navigator:
+    """
+    Switches the pages of the stacked widget. Pages with reusable = True
+    are created once and shown again on every visit. Any other page only
+    lives while it is shown: when another page replaces it, its shutdown()
+    is called to stop its threads and it is removed and deleted, so
+    navigating never piles up pages, Quiz threads or MediaPipe graphs.
+    """
+
+    def __init__(self, stack):
+        """
+        :param stack: QStackedWidget holding the pages
+        """
+        self.stack = stack
+        self.pages = {}
+
+    def show(self, page_class):
+        """
+        A reused page has its activate() called, if it has one, before it is shown again.
+        :return: The page now shown
+        """
+        page = self.pages.get(page_class)
+        if page is None:
+            page = page_class()
+            self.stack.addWidget(page)
+            if getattr(page, 'reusable', False):
+                self.pages[page_class] = page
+        elif hasattr(page, 'activate'):
+            page.activate()
+
+        previous = self.current()
+        self.stack.setCurrentWidget(page)
+        if previous is not None and previous is not page and not getattr(previous, 'reusable', False):
+            self.close(previous)
+        return page
+
+    def current(self):
+        return self.stack.currentWidget()
+
+    def close(self, page):
+        if hasattr(page, 'shutdown'):
+            page.shutdown()
+        self.stack.removeWidget(page)
+        page.deleteLater()
+
+    def shutdown(self):
+        """
+        Stops the page currently shown, on application exit.
+        """
+        page = self.current()
+        if page is not None and hasattr(page, 'shutdown'):
+            page.shutdown()
+
+
+class MainWindow(QWidget, ui_form('main_window')):
+    reusable = True
+    
     def __init__(self):
         super().__init__()
-        loadUi("ui/main_window.ui", self)
+        self.setupUi(self)
         
         self.original_geometry = self.geometry()
-        self.presentation = Presentation()
-        self.key_control = KeyboardController()
-        self.presentation.frame_signal.connect(self.computer_vision)
-        self.presentation.finished.connect(self.show_menu)
+        # Built when presentation mode is entered, the quiz never needs it
+        self.presentation = None
+        QApplication.instance().aboutToQuit.connect(self.shutdown_presentation)
         self.label.hide()
         self.pushButton_3.hide()
         
@@ -66,9 +164,7 @@ class MainWindow(QWidget):
         self.pushButton_4.clicked.connect(self.close_app)
         
     def to_quiz_menu(self):
-        quiz_menu = QuizMenu()
-        widget.addWidget(quiz_menu)
-        widget.setCurrentIndex(widget.currentIndex() + 1)
+        navigator.show(QuizMenu)
         
     def to_presentation(self):
         self.pushButton.hide()
@@ -81,18 +177,33 @@ class MainWindow(QWidget):
         widget.setGeometry(600, 200, 300, 200)
         self.pushButton_3.show()
         self.label.show()
-        self.presentation.run()
+        self.presentation = Presentation()
+        self.presentation.frame_ready.connect(self.computer_vision)
+        self.presentation.finished.connect(self.show_menu)
+        self.presentation.start()
         
-    @pyqtSlot(np.ndarray)
-    def computer_vision(self, frame):
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    @pyqtSlot()
+    def computer_vision(self):
+        rgb_frame = self.presentation.frames.take()
+        if rgb_frame is None:
+            return
         h, w, ch = rgb_frame.shape
         bytes_per_line = ch * w
         q_img = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
         self.label.setPixmap(QPixmap.fromImage(q_img))
+        self.presentation.frames.release()
         
     def stop_presentation(self):
         self.presentation.stop_presentation.emit()
+        
+    def shutdown_presentation(self):
+        if self.presentation is None:
+            return
+        self.presentation.stop()
+        self.presentation.wait()
+        # Back to the pool, which closes it when the app quits
+        detector_pool.release(self.presentation.detector)
+        self.presentation.detector = None
     
     def show_menu(self):
         self.pushButton_3.hide()
@@ -102,74 +213,78 @@ class MainWindow(QWidget):
         self.pushButton_2.show()
         self.pushButton_4.show()
         widget.showFullScreen()
-        self.presentation = Presentation()
-        self.presentation.frame_signal.connect(self.computer_vision)
-        self.presentation.finished.connect(self.show_menu)
+        self.presentation.wait()
+        detector_pool.release(self.presentation.detector)
+        self.presentation = None
         
     def close_app(self):
-        self.key_control.press('q')
-        self.key_control.release('q')
+        from pynput.keyboard import Controller as KeyboardController
+        
+        key_control = KeyboardController()
+        key_control.press('q')
+        key_control.release('q')
     
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Q:
             self.close()
 
 
-class QuizMenu(QWidget):
+class QuizMenu(QWidget, ui_form('quiz_menu')):
+    reusable = True
+    
     def __init__(self):
         super().__init__()
-        loadUi("ui/quiz_menu.ui", self)
+        self.setupUi(self)
         self.load_quiz_list()
         
         self.pushButton.clicked.connect(self.to_main_window)
         self.pushButton_2.clicked.connect(self.to_quiz_edit)
         self.pushButton_3.clicked.connect(self.to_quiz_window)
         
+    def activate(self):
+        self.load_quiz_list()
+        
     def to_main_window(self):
-        window = MainWindow()
-        widget.addWidget(window)
-        widget.setCurrentIndex(widget.currentIndex() + 1)
+        navigator.show(MainWindow)
         
     def to_quiz_edit(self):
-        quiz_edit = QuizEdit()
-        widget.addWidget(quiz_edit)
-        widget.setCurrentIndex(widget.currentIndex() + 1)
+        quiz_edit = navigator.show(QuizEdit)
         quiz_edit.quiz_index_from_menu.emit(self.comboBox.currentIndex())
         
     def to_quiz_window(self):
-        quiz_window = QuizWindow()
-        widget.addWidget(quiz_window)
-        widget.setCurrentIndex(widget.currentIndex() + 1)
+        quiz_window = navigator.show(QuizWindow)
         quiz_window.quiz_name_from_menu.emit(self.comboBox.currentText())
         
     def load_quiz_list(self):
+        quiz_names = quiz_catalog.names()
+        # The page is reused, drop quizzes deleted since it was last shown
+        for i in reversed(range(self.comboBox.count())):
+            if self.comboBox.itemText(i) not in quiz_names:
+                self.comboBox.removeItem(i)
         existing_files = [self.comboBox.itemText(i) for i in range(self.comboBox.count())]
-        if not os.path.exists('quiz'):
-                os.makedirs('quiz')
-        all_files = os.listdir('quiz')
-        csv_files = [os.path.splitext(file)[0] for file in all_files if file.endswith('.csv')]
         
-        for file in csv_files:
+        for file in quiz_names:
             if file not in existing_files:
                 self.comboBox.addItem(file)
 
 
-class QuizWindow(QWidget):
+class QuizWindow(QWidget, ui_form('quiz')):
     quiz_name_from_menu = pyqtSignal(str)
     
     def __init__(self):
         super().__init__()
-        loadUi("ui/quiz.ui", self)
+        self.setupUi(self)
         
         self.quiz_name = str()
         self.question_list = list()
         self.question = 0
+        self.prefetch_count = 3
         self.execution_time = time.time()
         
         self.thread = Quiz()
         self.quiz_name_from_menu.connect(self.quiz_data)
         self.quiz_name_from_menu.connect(self.thread.quiz_name_signal.emit)
-        self.thread.frame_signal.connect(self.computer_vision)
+        self.thread.frame_ready.connect(self.computer_vision)
         self.thread.indicator_signal.connect(self.handle_indicator)
         self.thread.see_hands_signal.connect(self.handle_indicator2)
         self.thread.question_signal.connect(self.handle_question)
@@ -182,31 +297,36 @@ class QuizWindow(QWidget):
         self.pushButton_3.clicked.connect(self.to_quiz_menu)
         
     def to_quiz_menu(self):
-        quiz_menu = QuizMenu()
-        widget.addWidget(quiz_menu)
-        widget.setCurrentIndex(widget.currentIndex() + 1)
-        self.thread.stop_signal.emit()
+        navigator.show(QuizMenu)
+        
+    def shutdown(self):
+        self.thread.stop_quiz()
+        self.thread.wait()
+        detector_pool.release(self.thread.detector)
+        self.thread.detector = None
         
     def quiz_data(self, quiz_name):
         self.quiz_name = quiz_name
-        with open(f'quiz/{self.quiz_name}.csv', 'r', newline='', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            self.question_list = list(reader)
+        self.question_list = quiz_catalog.questions(quiz_name)
         
-        self.progressBar.setMaximum(len(self.question_list) - 1)
+        self.progressBar.setMaximum(len(self.question_list))
         self.progressBar.setMinimum(0)
         self.reset_question()
+        # Wait for the layout so the labels have their final size
+        QTimer.singleShot(0, lambda: self.prefetch_questions(0))
     
-    @pyqtSlot(np.ndarray)
-    def computer_vision(self, frame):
-        cv_label_width = self.label.width()
-        cv_label_height = self.label.height()
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    @pyqtSlot()
+    def computer_vision(self):
+        # The worker scales frames to the label, picked up from the next frame on
+        self.thread.frames.set_target_size(self.label.width(), self.label.height())
+        rgb_frame = self.thread.frames.take()
+        if rgb_frame is None:
+            return
         h, w, ch = rgb_frame.shape
         bytes_per_line = ch * w
         frame_img = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        frame_resized = fit_pixmap(frame_img, cv_label_height, cv_label_width)
-        self.label.setPixmap(QPixmap.fromImage(frame_resized))
+        self.label.setPixmap(QPixmap.fromImage(frame_img))
+        self.thread.frames.release()
         
     def handle_indicator(self, indicator_color):
         self.label_11.setStyleSheet(f"""
@@ -225,27 +345,40 @@ class QuizWindow(QWidget):
                                     min-height: 30px;
                                     """)
         
+    def prefetch_questions(self, first):
+        choice_labels = [self.label_2, self.label_3, self.label_4, self.label_5]
+        requests = []
+        for question in self.question_list[first:first + self.prefetch_count]:
+            paths = [(self.label_1, question.question_image)]
+            if question.choice_type == 'image':
+                paths += zip(choice_labels, question.choices)
+            for label, image_path in paths:
+                if image_path.lower().endswith(('.png', '.jpg', 'jpeg')):
+                    requests.append((image_path, label.width(), label.height()))
+        image_prefetcher.prefetch(requests)
+        
     def handle_question(self, question_index):
         self.question = question_index
+        self.prefetch_questions(question_index + 1)
         self.progressBar.setValue(self.question)
-        question_data = self.question_list[self.question + 1]
-        self.label_10.setText(question_data[0])
+        question = self.question_list[self.question]
+        self.label_10.setText(question.question_text)
         
-        if question_data[1]:
-            self.set_image(self.label_1, question_data[1])
+        if question.question_image:
+            self.set_image(self.label_1, question.question_image)
         else:
             self.label_1.clear()
             
-        if question_data[2] == 'text':
-            self.label_2.setText(question_data[4])
-            self.label_3.setText(question_data[5])
-            self.label_4.setText(question_data[6])
-            self.label_5.setText(question_data[7])
-        elif question_data[2] == 'image':
-            self.set_image(self.label_2, question_data[4])
-            self.set_image(self.label_3, question_data[5])
-            self.set_image(self.label_4, question_data[6])
-            self.set_image(self.label_5, question_data[7])
+        if question.choice_type == 'text':
+            self.label_2.setText(question.choice1)
+            self.label_3.setText(question.choice2)
+            self.label_4.setText(question.choice3)
+            self.label_5.setText(question.choice4)
+        elif question.choice_type == 'image':
+            self.set_image(self.label_2, question.choice1)
+            self.set_image(self.label_3, question.choice2)
+            self.set_image(self.label_4, question.choice3)
+            self.set_image(self.label_5, question.choice4)
         
     def undo_question(self):
         if self.question >= 1:
@@ -257,29 +390,26 @@ class QuizWindow(QWidget):
         self.thread.command_signal.emit("reset")
         
     def finish_quiz(self, quiz_name, score, hands_unseen):
-        quiz_finish = QuizFinish()
-        widget.addWidget(quiz_finish)
-        widget.setCurrentIndex(widget.currentIndex() + 1)
+        quiz_finish = navigator.show(QuizFinish)
         quiz_finish.score_signal.emit(quiz_name, score, hands_unseen)
         
     def set_image(self, label, image_path):
+        image = None
         if image_path.lower().endswith(('.png', '.jpg', 'jpeg')):
-            label_height = label.height()
-            label_width = label.width()
-            pixmap = QPixmap(image_path)
-            pixmap_resized = fit_pixmap(pixmap, label_height, label_width)
-            label.setPixmap(pixmap_resized)
+            image = image_cache.load(image_path, label.width(), label.height())
+        if image is not None:
+            label.setPixmap(QPixmap.fromImage(image))
             label.setAlignment(Qt.AlignCenter)
         else:
             label.clear()
 
 
-class QuizFinish(QWidget):
+class QuizFinish(QWidget, ui_form('quiz_finish')):
     score_signal = pyqtSignal(str, float, float)
     
     def __init__(self):
         super().__init__()
-        loadUi("ui/quiz_finish.ui", self)
+        self.setupUi(self)
         
         self.quiz_name = ''
         self.score_signal.connect(self.show_result)
@@ -294,26 +424,24 @@ class QuizFinish(QWidget):
         self.label_3.setText(f"Hands out f camera: {hands_unseen:.1f} s")
         
     def to_quiz_menu(self):
-        quiz_menu = QuizMenu()
-        widget.addWidget(quiz_menu)
-        widget.setCurrentIndex(widget.currentIndex() + 1)
+        navigator.show(QuizMenu)
         
     def restart_quiz(self):
-        quiz_window = QuizWindow()
-        widget.addWidget(quiz_window)
-        widget.setCurrentIndex(widget.currentIndex() + 1)
+        quiz_window = navigator.show(QuizWindow)
         quiz_window.quiz_name_from_menu.emit(self.quiz_name)
 
 
-class QuizEdit(QWidget):
+class QuizEdit(QWidget, ui_form('quiz_edit')):
     quiz_index_from_menu = pyqtSignal(int)
+    image_ingested = pyqtSignal(str, str)
     closed = pyqtSignal()
     
     def __init__(self):
         super().__init__()
-        loadUi("ui/quiz_edit.ui", self)
+        self.setupUi(self)
         
         self.quiz_name = str()
+        self.new_quiz = None
         self.disable_choice_type()
         self.load_quiz_list()
         if not self.comboBox.currentText():
@@ -333,15 +461,21 @@ class QuizEdit(QWidget):
         self.upload_2.clicked.connect(self.image_upload)
         self.upload_3.clicked.connect(self.image_upload)
         self.upload_4.clicked.connect(self.image_upload)
+        self.image_ingested.connect(self.set_uploaded_image)
         self.comboBox.currentIndexChanged.connect(self.select_quiz_handle)
         self.pushButton.clicked.connect(self.save_inputs)
         self.radioButton.toggled.connect(self.disable_choice_type)
         self.radioButton_2.toggled.connect(self.disable_choice_type)
         
     def to_quiz_menu(self):
-        quiz_menu = QuizMenu()
-        widget.addWidget(quiz_menu)
-        widget.setCurrentIndex(widget.currentIndex() + 1)
+        quiz_store.flush()
+        navigator.show(QuizMenu)
+        
+    def shutdown(self):
+        if self.new_quiz is not None:
+            self.new_quiz.close()
+        # Uploads still being copied have nothing to show their image in anymore
+        self.image_ingested.disconnect()
         
     def new_quiz_window(self):
         self.new_quiz = NewQuiz()
@@ -364,12 +498,10 @@ class QuizEdit(QWidget):
                 number = str(current_number - 1)
                 self.label_11.setText(number)
         elif button[-1] == '6':
-            with open(f'quiz/{self.comboBox.currentText()}.csv', 'r', newline='', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                rows = list(reader)
-                if current_number < len(rows):
-                    number = str(current_number + 1)
-                    self.label_11.setText(number)
+            # One past the last question is a new, empty one
+            if current_number <= quiz_store.count(self.comboBox.currentText()):
+                number = str(current_number + 1)
+                self.label_11.setText(number)
         
         self.load_question()
     
@@ -392,20 +524,17 @@ class QuizEdit(QWidget):
         
     def load_quiz_list(self):
         existing_files = [self.comboBox.itemText(i) for i in range(self.comboBox.count())]
-        all_files = os.listdir('quiz')
-        csv_files = [os.path.splitext(file)[0] for file in all_files if file.endswith('.csv')]
         
-        for file in csv_files:
+        for file in quiz_catalog.names():
             if file not in existing_files:
                 self.comboBox.addItem(file)
                 
     def load_image(self, image_path, label):
+        image = None
         if image_path.lower().endswith(('.png', '.jpg', 'jpeg')):
-            label_height = label.height()
-            label_width = label.width()
-            pixmap = QPixmap(image_path)
-            pixmap = fit_pixmap(pixmap, label_height, label_width)
-            label.setPixmap(pixmap)
+            image = image_cache.load(image_path, label.width(), label.height())
+        if image is not None:
+            label.setPixmap(QPixmap.fromImage(image))
             label.setAlignment(Qt.AlignCenter)
         else:
             label.clear()
@@ -413,45 +542,41 @@ class QuizEdit(QWidget):
     def load_question(self):
         self.quiz_name = self.comboBox.currentText()
         question_number = int(self.label_11.text())
-        question_data = ['', '', 'text', '1', '', '', '', '']
-            
-        with open(f'quiz/{self.quiz_name}.csv', 'r', newline='', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            for i, row in enumerate(reader):
-                if i == question_number:
-                    question_data = row
-                    
-            self.questionText.setPlainText(question_data[0])
-            self.comboBox_2.setCurrentIndex(int(question_data[3]) - 1)
-            self.label_6.setText(question_data[1])
-            self.load_image(question_data[1], self.label)
+        question_data = quiz_store.question(self.quiz_name, question_number)
+        if question_data is None:
+            question_data = ['', '', 'text', '1', '', '', '', '']
             
-            self.choice_1.clear()
-            self.choice_2.clear()
-            self.choice_3.clear()
-            self.choice_4.clear()
-            self.label_7.clear()
-            self.label_8.clear()
-            self.label_9.clear()
-            self.label_10.clear()
-            
-            if question_data[2] == 'text':
-                self.radioButton.setChecked(True)
-                self.choice_1.setPlainText(question_data[4])
-                self.choice_2.setPlainText(question_data[5])
-                self.choice_3.setPlainText(question_data[6])
-                self.choice_4.setPlainText(question_data[7])
-            elif question_data[2] == 'image':
-                self.radioButton_2.setChecked(True)
-                self.label_7.setText(question_data[4])
-                self.label_8.setText(question_data[5])
-                self.label_9.setText(question_data[6])
-                self.label_10.setText(question_data[7])
-            
-            self.load_image(question_data[4], self.label_2)
-            self.load_image(question_data[5], self.label_3)
-            self.load_image(question_data[6], self.label_4)
-            self.load_image(question_data[7], self.label_5)
+        self.questionText.setPlainText(question_data[0])
+        self.comboBox_2.setCurrentIndex(int(question_data[3]) - 1)
+        self.label_6.setText(question_data[1])
+        self.load_image(question_data[1], self.label)
+        
+        self.choice_1.clear()
+        self.choice_2.clear()
+        self.choice_3.clear()
+        self.choice_4.clear()
+        self.label_7.clear()
+        self.label_8.clear()
+        self.label_9.clear()
+        self.label_10.clear()
+        
+        if question_data[2] == 'text':
+            self.radioButton.setChecked(True)
+            self.choice_1.setPlainText(question_data[4])
+            self.choice_2.setPlainText(question_data[5])
+            self.choice_3.setPlainText(question_data[6])
+            self.choice_4.setPlainText(question_data[7])
+        elif question_data[2] == 'image':
+            self.radioButton_2.setChecked(True)
+            self.label_7.setText(question_data[4])
+            self.label_8.setText(question_data[5])
+            self.label_9.setText(question_data[6])
+            self.label_10.setText(question_data[7])
+        
+        self.load_image(question_data[4], self.label_2)
+        self.load_image(question_data[5], self.label_3)
+        self.load_image(question_data[6], self.label_4)
+        self.load_image(question_data[7], self.label_5)
         
     def save_inputs(self):
         question_number = int(self.label_11.text())
@@ -480,32 +605,20 @@ class QuizEdit(QWidget):
                 self.label_10.text()
             ])
         
-        with open(f'quiz/{self.quiz_name}.csv', 'r', newline='', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            rows = list(reader)
-            
-            row = [
-                question_text,
-                question_image,
-                choice_type,
-                answer
-            ]
-            for choice in choices:
-                row.append(choice)
-            if question_number < len(rows):
-                rows[question_number] = row
-            else:
-                rows.append(row)
-            
-            with open(f'quiz/{self.quiz_name}.csv', mode='w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerows(rows)
+        row = [
+            question_text,
+            question_image,
+            choice_type,
+            answer
+        ]
+        for choice in choices:
+            row.append(choice)
+        quiz_store.save_question(self.quiz_name, question_number, row)
                 
     def delete_quiz(self):
-        quiz_path = f'quiz/{self.quiz_name}.csv'
         quiz_index = self.comboBox.currentIndex()
-        if os.path.exists(quiz_path):
-            os.remove(quiz_path)
+        if self.quiz_name in quiz_store.names():
+            quiz_store.delete_quiz(self.quiz_name)
             self.comboBox.removeItem(quiz_index)
             if quiz_index > 0:
                 self.comboBox.setCurrentIndex(quiz_index - 1)
@@ -514,16 +627,7 @@ class QuizEdit(QWidget):
             
     def delete_question(self):
         question_number = int(self.label_11.text())
-        rows = []
-        with open(f'quiz/{self.quiz_name}.csv', mode='r', newline='', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            for index, row in enumerate(reader):
-                if index != question_number:
-                    rows.append(row)
-
-        with open(f'quiz/{self.quiz_name}.csv', mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerows(rows)
+        quiz_store.delete_question(self.quiz_name, question_number)
             
         if question_number >= 2:
             self.label_11.setText(str(question_number - 1))
@@ -535,74 +639,71 @@ class QuizEdit(QWidget):
         
         filepath, _ = QFileDialog.getOpenFileName(self, "Open File", "", image_formats)
         if filepath:
-            target_directory = 'quiz/images'
-            if not os.path.exists(target_directory):
-                os.makedirs(target_directory)
+            future = image_ingest.submit(filepath)
+            future.add_done_callback(lambda future: self.image_upload_done(button, future))
             
-            try:
-                copied_path = shutil.copy(filepath, target_directory)
-                normalized_path = copied_path.replace(os.sep, '/')
-            except Exception as e:
-                print(f'Error copying file: {e}')
+    def image_upload_done(self, button, future):
+        # Runs on the ingest thread, the signal brings the result back to the GUI thread
+        try:
+            normalized_path = future.result()
+        except Exception as e:
+            print(f'Error copying file: {e}')
+            return
+        if not sip.isdeleted(self):
+            self.image_ingested.emit(button, normalized_path)
             
-            if button[-1] == '0':
-                self.label_6.setText(normalized_path)
-                self.load_image(normalized_path, self.label)
-            elif button[-1] == '1':
-                self.label_7.setText(normalized_path)
-                self.load_image(normalized_path, self.label_2)
-            elif button[-1] == '2':
-                self.label_8.setText(normalized_path)
-                self.load_image(normalized_path, self.label_3)
-            elif button[-1] == '3':
-                self.label_9.setText(normalized_path)
-                self.load_image(normalized_path, self.label_4)
-            elif button[-1] == '4':
-                self.label_10.setText(normalized_path)
-                self.load_image(normalized_path, self.label_5)
-
-
-class NewQuiz(QWidget):
+    def set_uploaded_image(self, button, normalized_path):
+        if button[-1] == '0':
+            self.label_6.setText(normalized_path)
+            self.load_image(normalized_path, self.label)
+        elif button[-1] == '1':
+            self.label_7.setText(normalized_path)
+            self.load_image(normalized_path, self.label_2)
+        elif button[-1] == '2':
+            self.label_8.setText(normalized_path)
+            self.load_image(normalized_path, self.label_3)
+        elif button[-1] == '3':
+            self.label_9.setText(normalized_path)
+            self.load_image(normalized_path, self.label_4)
+        elif button[-1] == '4':
+            self.label_10.setText(normalized_path)
+            self.load_image(normalized_path, self.label_5)
+
+
+class NewQuiz(QWidget, ui_form('new_quiz')):
     closed = pyqtSignal()
     
     def __init__(self):
         super().__init__()
-        loadUi("ui/new_quiz.ui", self)
+        self.setupUi(self)
         
         self.setWindowFlags(Qt.Window | Qt.CustomizeWindowHint | Qt.WindowTitleHint)
         self.setWindowModality(Qt.ApplicationModal)
-        self.all_files = os.listdir('quiz')
+        self.quiz_names = quiz_catalog.names()
         
         self.pushButton.clicked.connect(self.save_quiz)
         self.pushButton_2.clicked.connect(self.cancel_button)
         self.pushButton_3.clicked.connect(self.to_quiz_menu)
         
     def to_quiz_menu(self):
-        quiz_menu = QuizMenu()
-        widget.addWidget(quiz_menu)
-        widget.setCurrentIndex(widget.currentIndex() + 1)
+        quiz_store.flush()
+        navigator.show(QuizMenu)
         self.close()
         
     def cancel_button(self):
-        csv_files = [file for file in self.all_files if file.endswith('.csv')]
-        
-        if not csv_files:
+        if not self.quiz_names:
             self.label_2.setText('There is no Quiz to edit, Create one to edit.')
-        elif csv_files:
+        else:
             self.close()
         
     def save_quiz(self):
         quiz_name = self.lineEdit.text()
-        csv_files = [os.path.splitext(file)[0] for file in self.all_files if file.endswith('.csv')]
         
         if quiz_name:
-            if quiz_name in csv_files:
+            if quiz_name in self.quiz_names:
                 self.label_2.setText('There is already a Quiz with that name.')
             else:
-                with open(f'quiz/{quiz_name}.csv', 'w', newline='', encoding='utf-8') as file:
-                    writer = csv.writer(file)
-                    writer.writerow(['question_text', 'question_image', 'choice_type', 'answer', 'choice1', 'choice2', 
-                                    'choice3', 'choice4'])
+                quiz_store.create_quiz(quiz_name)
                 self.close()
                 self.closed.emit()
         else:
@@ -617,154 +718,229 @@ class EscapeFilter(QObject):
         return super().eventFilter(obj, event)
 
 
+def run_frames(worker, step):
+    """
+    Frame loop shared by the Presentation and Quiz threads. Reads the shared
+    camera until worker.running is cleared, runs step on every flipped frame
+    and publishes what it returns, then releases the camera and reports the
+    timings.
+    :param worker: Presentation or Quiz thread, with its camera acquired
+    :param step: Function of the flipped frame and its capture time, returning the frame to show
+    """
+    profiler = worker.profiler
+    while worker.running:
+        profiler.begin()
+        success, img = worker.video.read()
+        if not success:
+            # read() already waited for a frame, the camera keeps retrying meanwhile
+            profiler.cancel()
+            continue
+        profiler.lap('capture')
+        img = cv2.flip(img, 1)
+        profiler.lap('flip')
+        img = step(img, worker.video.read_timestamp)
+        if profiler.overlay:
+            profiler.draw(img)
+            profiler.lap('overlay')
+            
+        if worker.frames.publish(img):
+            worker.frame_ready.emit()
+        profiler.lap('publish')
+        profiler.end()
+        
+    cameras.release(worker.video)
+    worker.frames.clear()
+    if worker.recorder is not None:
+        worker.recorder.close()
+    if profiler.enabled:
+        print("Stage times:", profiler.summary())
+        print("Motion to action latency:", worker.latency.summary())
+        print(f"Detections: {worker.governor.detected}, skipped: {worker.governor.skipped}")
+    profiler.export()
+    worker.latency.export()
+
+
 class Presentation(QThread):
-    frame_signal = pyqtSignal(np.ndarray)
-    finished = pyqtSignal()
+    frame_ready = pyqtSignal()
     stop_presentation = pyqtSignal()
     
-    def __init__(self, smoothening=5):
+    def __init__(self, smoothening=5, clock=time.time):
+        """
+        :param clock: Returns the current time in seconds, replay.VirtualClock when replaying a recording
+        """
         super().__init__()
+        self.clock = clock
         self.frameX = 150
         self.frameY = 125
         self.smoothening = smoothening
         self.plocX, self.plocY = 0, 0
         self.clocX, self.clocY = 0, 0
+        self.targetX, self.targetY = 0, 0
+        self.moving = False
         
         # Disable scientific notation for clarity
         np.set_printoptions(suppress=True)
-        # Load the model
-        self.model = load_model("model/presentation_keys.h5")
-        self.img_size = 256
-
-        self.mpHands = solutions.hands
-        self.mpDraw = solutions.drawing_utils
-        self.video = video
-        self.detector = HandDetector(maxHands=1)
-        self.wCam = wCam
-        self.hCam = hCam
+        # The model, detector and controllers are set up by load() on the worker thread
+        self.img_size = presentation_loader.img_size
+        self.model = None
+        self.landmark_model = None
+        self.mpHands = None
+        self.mpDraw = None
+        self.video = None
+        self.detector = None
+        self.wCam = 0
+        self.hCam = 0
         self.window_name = 'window_name'
         
         self.key_mode = False
-        self.detected_answer = str()
         self.running = True
-        self.last_execution_time = time.time()
-        self.detection_time = time.time()
-        self.cooldown = time.time()
-        self.double_detection = False
+        self.last_execution_time = self.clock()
+        self.cooldown = self.clock()
+        # Keys are weighted by the key classifier, switching to key mode needs a longer hold
+        self.key_confirmer = GestureConfirmer(min_confidence=0.7)
+        self.mode_confirmer = GestureConfirmer(threshold=12.0, min_dwell=0.5)
+        # Key, classifier probability and time of the last prediction, rerun at most every prediction_interval
+        self.key_confidence = (None, 0.0, 0.0)
+        self.prediction_interval = 0.5
+        self.skeleton = None
+        self.mouse_control = None
+        self.key_control = None
+        self.keys = {}
+        self.buttons = {}
+        self.recorder = None
+        self.frames = FramePresenter()
+        self.profiler = StageProfiler('presentation')
+        self.latency = LatencyTracker('presentation-latency')
+        # The cursor is eased every frame, so 15 detections per second are enough to steer it
+        self.governor = DetectionGovernor(tracking_interval=1 / 15)
+        self.wScr = 0
+        self.hScr = 0
+            
+        self.stop_presentation.connect(self.stop)
+        
+    def load(self):
+        from pynput.mouse import Button, Controller as MouseController
+        from pynput.keyboard import Key, Controller as KeyboardController
+        from screeninfo import get_monitors
+        
+        model = presentation_loader.get()
+        if isinstance(model, LandmarkClassifier):
+            self.landmark_model = model
+        else:
+            self.model = model
+        self.detector = detector_pool.acquire(**PRESENTATION_DETECTOR)
+        self.detector.profiler = self.profiler
+        self.recorder = LandmarkRecorder.from_env('presentation')
+        self.detector.recorder = self.recorder
+        self.mpHands = self.detector.mpHands
+        self.mpDraw = self.detector.mpDraw
         self.mouse_control = MouseController()
         self.key_control = KeyboardController()
-        self.responses = []
-        self.start_time = time.time()
+        # Key and button names used by the gestures
+        self.keys = {'esc': Key.esc, 'b': 'b', 'right': Key.right, 'left': Key.left}
+        self.buttons = {'left': Button.left, 'right': Button.right}
         for monitor in get_monitors():
             self.wScr = monitor.width
             self.hScr = monitor.height
             
-        self.stop_presentation.connect(self.stop)
-            
     def key_detection(self, hand, img, hand_lms):
-        current_time = time.time()
+        current_time = self.clock()
             
         if current_time > self.cooldown + 1:
-            if not self.double_detection:
-                self.detected_answer = self.key_check(hand)
-                self.detection_time = time.time()
-                self.double_detection = True
-                
-            elif current_time > self.detection_time + 0.5:
-                key = self.key_check(hand)
-                prediction = self.key_prediction(hand, img, hand_lms)
-                if self.detected_answer == key:
-                    if hand['type'] == "Right":
-                        if key == 'esc' and prediction[0][1] >= 0.7:
-                            self.press_key(Key.esc)
-                            print('esc')
-                        elif key == 'b' and prediction[0][0] >= 0.7:
-                            self.press_key('b')
-                            print('b')
-                        elif key == 'right' and prediction[0][3] >= 0.7:
-                            self.press_key(Key.right)
-                            print('R')
-                        elif key == 'left' and prediction[0][2] >= 0.7:
-                            self.press_key(Key.left)
-                            print('L')
-                        elif key == 'switch' and prediction[0][4] >= 0.7:
-                            self.key_mode = False
-                            print('switch')
-                        print(key, prediction)
-                        if key:
-                            self.cooldown = time.time()
-                        
-                self.double_detection = False
+            key = self.key_check(hand)
+            confidence = 0.0
+            # Only the right hand gives keys, the key classifier's probability is the vote's confidence
+            if key and hand['type'] == "Right":
+                predicted_key, confidence, predicted_time = self.key_confidence
+                if key != predicted_key or current_time - predicted_time >= self.prediction_interval:
+                    prediction = self.key_prediction(hand, img, hand_lms)
+                    confidence = float(prediction[0][KEY_LABELS.index(key)])
+                    self.key_confidence = (key, confidence, current_time)
+            key = self.key_confirmer.update(key, current_time, hand['lmList'], confidence)
+            if key == 'esc':
+                self.press_key(self.keys['esc'])
+                print('esc')
+            elif key == 'b':
+                self.press_key(self.keys['b'])
+                print('b')
+            elif key == 'right':
+                self.press_key(self.keys['right'])
+                print('R')
+            elif key == 'left':
+                self.press_key(self.keys['left'])
+                print('L')
+            elif key == 'switch':
+                self.key_mode = False
+                print('switch')
+            if key:
+                self.latency.action(key)
+                self.cooldown = self.clock()
                 
     def key_prediction(self, hand, img, hand_lms):
-        img[:] = 0
-        self.mpDraw.draw_landmarks(img, hand_lms, self.mpHands.HAND_CONNECTIONS)
-        crop_img = self.crop_bbox(hand, img)
-        return self.model.predict(np.expand_dims(crop_img / 255, 0))
+        self.profiler.lap('gestures')
+        if self.landmark_model is not None:
+            prediction = self.landmark_model.predict(hand['lmList'])
+        else:
+            # The model sees the skeleton alone, drawn apart from the displayed frame
+            if self.skeleton is None or self.skeleton.shape != img.shape:
+                self.skeleton = np.zeros_like(img)
+            self.skeleton[:] = 0
+            self.mpDraw.draw_landmarks(self.skeleton, hand_lms, self.mpHands.HAND_CONNECTIONS)
+            crop_img = self.crop_bbox(hand, self.skeleton)
+            if crop_img is None:
+                prediction = np.zeros((1, len(KEY_LABELS)))
+            else:
+                prediction = self.model.predict(crop_img)
+        self.profiler.lap('predict')
+        return prediction
             
     def key_check(self, hand):
-        tips_up = self.detector.tipsUp(hand)
-        tips_side = self.detector.tipsSide(hand)
-        fingers_up = self.detector.fingersUp(hand)
-        fingers_side = self.detector.fingersSide(hand)
-        thumb_above_mid_tip = self.detector.thumbsAboveMidTip(hand)
-        thumb_right_point = self.detector.thumbsRightPoint(hand)
-        key = str()
-        
-        if tips_up[0] == 1 and tips_up[1] == 0 and tips_side[0] == 1 and thumb_right_point == 1:
-            key = 'esc'
-        elif tips_up[1] == 1 and tips_up[4] == 1 and fingers_side == 1 and thumb_above_mid_tip == 0 and thumb_right_point == 1:
-            key = 'b'
-        elif tips_side[1] == 1 and tips_side[4] == 0 and fingers_up == 1 and thumb_above_mid_tip == 1:
-            key = 'right'
-        elif tips_side[1] == 0 and tips_side[4] == 1 and fingers_up == 1 and thumb_above_mid_tip == 1:
-            key = 'left'
-        elif tips_up[1] == 1 and tips_up[4] == 0 and tips_up[0] == 1 and fingers_side == 1:
-            key = 'switch'
-            
-        return key
+        state = self.detector.handState(hand)
+        return gestures.match('presentation_keys', state, hand['type']) or str()
                 
     def press_key(self, key):
         self.key_control.press(key)
         self.key_control.release(key)
         
     def cursor_control(self, img):
-        current_time = time.time()
+        current_time = self.clock()
         hands, img = self.detector.findHands(img)
+        self.governor.seen(hands, current_time)
         lmList, bbox = self.detector.findPosition(img, draw=False, drawTip=1)
-        fingers = []
+        self.moving = False
         if len(lmList) != 0:
             x1, y1 = lmList[8][1:]
-            
-            if hands[0]['type'] == "Right":
-                fingers = self.detector.tipsUp(hands[0])
+            action = gestures.match('cursor', self.detector.handState(hands[0]), hands[0]['type'])
+            if self.mode_confirmer.update('key_mode' if action == 'key_mode' else None, current_time,
+                                          hands[0]['lmList']):
+                self.key_mode = True
+                self.latency.action('key_mode')
 
-            if fingers:
-                if fingers[0] == 1:
-                    x3 = np.interp(x1, (25, self.wCam - self.frameX), (0, self.wScr))
-                    y3 = np.interp(y1, (25, self.hCam - self.frameY), (0, self.hScr))
-
-                    self.clocX = self.plocX + (x3 - self.plocX) / self.smoothening
-                    self.clocY = self.plocY + (y3 - self.plocY) / self.smoothening
+            if action == 'move':
+                self.targetX = np.interp(x1, (25, self.wCam - self.frameX), (0, self.wScr))
+                self.targetY = np.interp(y1, (25, self.hCam - self.frameY), (0, self.hScr))
+                self.moving = True
+                self.move_cursor()
+                self.latency.action('move')
+            
+            elif action and current_time - self.last_execution_time >= 0.4:
+                if action == 'left_click':
+                    self.mouse_control.click(self.buttons['left'], 1)
+                    self.latency.action('left_click')
+                    self.last_execution_time = self.clock()
+                elif action == 'right_click':
+                    self.mouse_control.click(self.buttons['right'], 1)
+                    self.latency.action('right_click')
+                    self.last_execution_time = self.clock()
+        else:
+            self.mode_confirmer.update(None, current_time)
+                        
+    def move_cursor(self):
+        self.clocX = self.plocX + (self.targetX - self.plocX) / self.smoothening
+        self.clocY = self.plocY + (self.targetY - self.plocY) / self.smoothening
 
-                    self.mouse_control.position = (self.clocX, self.clocY)
-                    self.plocX, self.plocY = self.clocX, self.clocY
-                
-                elif fingers[0] == 0:
-                    if current_time - self.last_execution_time >= 0.4:
-                        if fingers[1] == 0:
-                            self.mouse_control.click(Button.left, 1)
-                            self.last_execution_time = time.time()
-                        elif fingers[2] == 0:
-                            self.mouse_control.click(Button.right, 1)
-                            self.last_execution_time = time.time()
-                        elif fingers[4] == 1:
-                            if not self.double_detection:
-                                self.double_detection = True
-                                self.detection_time = time.time()
-                            elif current_time > self.detection_time + 1.5:
-                                self.key_mode = True
-                                self.double_detection = False
+        self.mouse_control.position = (self.clocX, self.clocY)
+        self.plocX, self.plocY = self.clocX, self.clocY
                                 
     def crop_bbox(self, hand, img, offset=20):
         x, y, w, h = hand['bbox']
@@ -800,178 +976,193 @@ class Presentation(QThread):
         
 
     def run(self):
-        while self.running:
-            self.start_time = time.time()
-            success, img = self.video.read()
-            img = cv2.flip(img, 1)
-            
-            if self.key_mode:
+        try:
+            self.load()
+        except Exception as e:
+            print(f'Could not start presentation mode: {e}')
+            return
+        self.video = cameras.acquire()
+        if self.video is None:
+            print('No camera available')
+            return
+        self.wCam = self.video.width
+        self.hCam = self.video.height
+        run_frames(self, self.step)
+        
+    def step(self, img, capture_time=None):
+        """
+        Runs the gesture logic on one flipped frame.
+        :param capture_time: time.perf_counter() when the frame was captured, for the latency tracking
+        :return: The frame with the overlays drawn
+        """
+        if capture_time is not None:
+            self.latency.frame(capture_time)
+        current_time = self.clock()
+        
+        if self.key_mode:
+            on_cooldown = current_time <= self.cooldown + 1
+            if self.governor.should_detect(current_time, self.key_confirmer.confirming, on_cooldown):
                 hands, img, hand_lms = self.detector.findHands(img, draw=True, getLms=True)
+                self.governor.seen(hands, current_time)
                 if hands:
                     hand = hands[0]
                     self.key_detection(hand, img, hand_lms)
-                
-            else:
-                self.cursor_control(img)
-                cv2.rectangle(img, (25, 25), (self.wCam - self.frameX, self.hCam - self.frameY),
-                              (0, 255, 0), 1)
-                cv2.putText(img, "screen", (25, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.8,
-                            (0, 255, 0), 1)
-            
-            self.frame_signal.emit(img)
+                else:
+                    self.key_confirmer.update(None, current_time)
+            self.profiler.lap('gestures')
             
-            if cv2.waitKey(1) == ord('q'):
-                self.stop()
-                
-        #     response = time.time() - self.start_time
-        #     self.responses.append(response)
-                
-        # print("Avg. Response: ", sum(self.responses) / len(self.responses))
+        else:
+            if self.governor.should_detect(current_time, self.mode_confirmer.confirming):
+                self.cursor_control(img)
+            elif self.moving:
+                # Keep easing towards the last target between detections
+                self.move_cursor()
+            self.profiler.lap('gestures')
+            cv2.rectangle(img, (25, 25), (self.wCam - self.frameX, self.hCam - self.frameY),
+                          (0, 255, 0), 1)
+            cv2.putText(img, "screen", (25, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.8,
+                        (0, 255, 0), 1)
+        self.profiler.lap('draw')
+        return img
         
     def stop(self):
         self.running = False
-        self.finished.emit()
-
-
-
-class Data():
-    def __init__(self, data):
-        self.question_text = data["question_text"]
-        self.question_image = data["question_image"]
-        self.choice_type = data["choice_type"]
-        self.answer = int(data["answer"])
-        self.choice1 = data["choice1"]
-        self.choice2 = data["choice2"]
-        self.choice3 = data["choice3"]
-        self.choice4 = data["choice4"]
-
-        self.chosen_answer = None
-
-    def update(self, fingers):
-        if fingers == [0, 1, 0, 0, 0]:  # Jika 1 jari diangkat
-            self.chosen_answer = 1
-        elif fingers == [0, 1, 1, 0, 0]:  # Jika 2 jari diangkat
-            self.chosen_answer = 2
-        elif fingers == [0, 1, 1, 1, 0]:  # Jika 3 jari diangkat
-            self.chosen_answer = 3
-        elif fingers == [0, 1, 1, 1, 1]:  # Jika 4 jari diangkat
-            self.chosen_answer = 4
-        else:  # Jika 5 jari diangkat
-            self.chosen_answer = None
-             
-             
+
+
 
 class Quiz(QThread):
     quiz_name_signal = pyqtSignal(str)
-    frame_signal = pyqtSignal(np.ndarray)
+    frame_ready = pyqtSignal()
     indicator_signal = pyqtSignal(str)
     see_hands_signal = pyqtSignal(str)
     question_signal = pyqtSignal(int)
     reset_signal = pyqtSignal(int)
     command_signal = pyqtSignal(str)
     finish_signal = pyqtSignal(str, float, float)
-    stop_signal = pyqtSignal()
     
-    def __init__(self, camera_source=0):
+    def __init__(self, clock=time.time):
+        """
+        :param clock: Returns the current time in seconds, replay.VirtualClock when replaying a recording
+        """
         super().__init__()
-        self.video = video
-        self.detector = HandDetector(detectionCon=0.8, maxHands=2)
+        self.clock = clock
+        self.video = None
+        # Taken from detector_pool by run(), so building the quiz screen never waits for MediaPipe
+        self.detector = None
         self.window_name = 'window_name'
         
         self.quiz_name = str()
-        self.ardlist = []
+        self.questions = ()
+        self.chosen_answers = []
         self.running = True
         self.qNo = 0
         self.score = 0
         self.qTotal = 0
         
-        self.last_execution_time = time.time()
-        self.detection_time = time.time()
+        self.last_execution_time = self.clock()
         self.hands_unseen = float()
         self.cooldown_period = 1
         self.hands_seen = True
         self.on_cooldown = True
-        self.detected_answer = None
-        self.double_detection = False
+        # Answering the next question with the same gesture needs the hand to be changed or lowered first
+        self.confirmer = GestureConfirmer(repeat=False)
+        self.governor = DetectionGovernor()
+        self.frames = FramePresenter()
+        self.profiler = StageProfiler('quiz')
+        self.latency = LatencyTracker('quiz-latency')
+        self.recorder = None
+        self.hands = []
         
         self.quiz_name_signal.connect(self.import_quiz_data)
         self.command_signal.connect(self.handle_command)
-        self.stop_signal.connect(self.stop_quiz)
         
     def import_quiz_data(self, quiz_name):
         self.quiz_name = quiz_name
-        with open(f'quiz/{self.quiz_name}.csv', newline='') as file:
-            reader = csv.DictReader(file)
-            data = list(reader)
-        for q in data:
-            self.ardlist.append(Data(q))
-        self.qTotal = len(data)
+        self.questions = quiz_catalog.questions(quiz_name)
+        self.chosen_answers = [None] * len(self.questions)
+        self.qTotal = len(self.questions)
 
     def run(self):
-        while self.running:
-            current_time = time.time()
-            success, img = self.video.read()
-            img = cv2.flip(img, 1)
-            hands, img = self.detector.findHands(img)
-            
-            if self.on_cooldown:
-                if current_time - self.last_execution_time >= self.cooldown_period:
-                    self.on_cooldown = False
-                    self.indicator_signal.emit('rgba(0, 0, 0, 0)')
-            
-            elif self.qNo < self.qTotal:
-                ard = self.ardlist[self.qNo]
-
-                if hands and len(hands) > 0:
-                    # lmList = hands[0]['lmList']
-                    fingers = self.detector.tipsUp(hands[0])
-                    ard.update(fingers)
-                    answer = ard.chosen_answer
-                    
-                    if answer:
-                        if not self.double_detection:
-                            self.detected_answer = answer
-                            self.detection_time = time.time()
-                            self.double_detection = True
-                            self.indicator_signal.emit('rgb(0, 255, 0)')
-                        
-                        elif current_time > self.detection_time + 1:
-                            self.double_detection = False
-                            if answer == self.detected_answer:
-                                self.qNo += 1
-                                if self.qNo != self.qTotal:
-                                    self.question_signal.emit(self.qNo)
-                                self.indicator_signal.emit('red')
-                                self.on_cooldown = True
-                                self.last_execution_time = time.time()
-                    else:
-                        self.indicator_signal.emit('rgba(0, 0, 0, 0)')
-                        self.detected_answer = None
-                else:
-                    self.indicator_signal.emit('rgba(0, 0, 0, 0)')
-                    self.detected_answer = None
-                    
-            if len(hands) < 2:
-                if self.hands_seen is True:
-                    self.hands_unseen -= current_time
-                    self.see_hands_signal.emit('rgb(255, 0, 0)')
-                    self.hands_seen = False
+        self.detector = detector_pool.acquire(**QUIZ_DETECTOR)
+        self.detector.profiler = self.profiler
+        self.recorder = LandmarkRecorder.from_env('quiz')
+        self.detector.recorder = self.recorder
+        self.video = cameras.acquire()
+        if self.video is None:
+            print('No camera available')
+            return
+        run_frames(self, self.step)
+        cv2.destroyAllWindows()
+        
+    def step(self, img, capture_time=None):
+        """
+        Runs the answer logic on one flipped frame.
+        :param capture_time: time.perf_counter() when the frame was captured, for the latency tracking
+        :return: The frame with the detections drawn
+        """
+        current_time = self.clock()
+        detected = self.governor.should_detect(current_time, self.confirmer.confirming, self.on_cooldown)
+        if detected:
+            # self.hands is reused on skipped frames, so it keeps the capture time of its own frame
+            if capture_time is not None:
+                self.latency.frame(capture_time)
+            self.hands, img = self.detector.findHands(img)
+            self.governor.seen(self.hands, current_time)
+        hands = self.hands
+        
+        if self.on_cooldown and current_time - self.last_execution_time >= self.cooldown_period:
+            self.on_cooldown = False
+            self.indicator_signal.emit('rgba(0, 0, 0, 0)')
+        
+        if self.qNo < self.qTotal and detected:
+            confirming = self.confirmer.confirming
+            if hands:
+                # Jumlah jari yang diangkat, lihat "quiz_answers" di gestures.json
+                answer = gestures.match('quiz_answers', self.detector.handState(hands[0]), hands[0]['type'])
+                # The rules give no confidence, the answer is weighted by the hand's stability only
+                answer = self.confirmer.update(answer, current_time, hands[0]['lmList'])
             else:
-                if self.hands_seen is False:
-                    self.hands_unseen += current_time
-                    self.see_hands_signal.emit('rgb(0, 255, 0)')
-                    self.hands_seen = True
-
-            if self.qNo == self.qTotal:
-                self.score = sum(1 for ard in self.ardlist if ard.answer == ard.chosen_answer)
-                self.score = round((self.score / self.qTotal) * 100, 2)
-                self.qNo = 0
-                self.finish_signal.emit(self.quiz_name, self.score, self.hands_unseen)
-                self.stop_quiz()
+                answer = self.confirmer.update(None, current_time)
                 
-            self.frame_signal.emit(img)
-            
-        cv2.destroyAllWindows()
+            if self.on_cooldown:
+                # The votes still count, so lowering or changing the hand releases the last answer,
+                # but an answer confirmed now has to be confirmed again once the cooldown is over
+                if answer:
+                    self.confirmer.reset()
+            elif answer:
+                self.chosen_answers[self.qNo] = answer
+                self.qNo += 1
+                if self.qNo != self.qTotal:
+                    self.question_signal.emit(self.qNo)
+                self.latency.action('answer')
+                self.indicator_signal.emit('red')
+                self.on_cooldown = True
+                self.last_execution_time = self.clock()
+            elif self.confirmer.confirming and not confirming:
+                self.indicator_signal.emit('rgb(0, 255, 0)')
+            elif confirming and not self.confirmer.confirming:
+                self.indicator_signal.emit('rgba(0, 0, 0, 0)')
+                
+        if len(hands) < 2:
+            if self.hands_seen is True:
+                self.hands_unseen -= current_time
+                self.see_hands_signal.emit('rgb(255, 0, 0)')
+                self.hands_seen = False
+        else:
+            if self.hands_seen is False:
+                self.hands_unseen += current_time
+                self.see_hands_signal.emit('rgb(0, 255, 0)')
+                self.hands_seen = True
+
+        if self.qNo == self.qTotal:
+            self.score = sum(1 for question, chosen_answer in zip(self.questions, self.chosen_answers)
+                             if question.answer == chosen_answer)
+            self.score = round((self.score / self.qTotal) * 100, 2)
+            self.qNo = 0
+            self.finish_signal.emit(self.quiz_name, self.score, self.hands_unseen)
+            self.stop_quiz()
+        self.profiler.lap('gestures')
+        return img
     
     @pyqtSlot(str)
     def handle_command(self, command):
@@ -984,7 +1175,8 @@ class Quiz(QThread):
             self.score = 0
             self.reset_signal.emit(self.qNo)
             
-        self.last_execution_time = time.time()
+        self.confirmer.reset()
+        self.last_execution_time = self.clock()
         
     def stop_quiz(self):
         self.running = False
@@ -994,17 +1186,23 @@ class Quiz(QThread):
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     widget = QtWidgets.QStackedWidget()
-    window = MainWindow()
+    navigator = Navigator(widget)
+    navigator.show(MainWindow)
     widget.setObjectName('Form')
-    widget.addWidget(window)
     widget.setWindowTitle('Window')
     widget.setWindowIcon(QIcon('logo_upi.ico'))
     widget.setStyleSheet("QWidget#Form {background: qradialgradient(cx: 0.7, cy: 1.4, fx: 0.7, fy: 1.4, radius: 1.35, stop: 0 #597fb0, stop: 1 #1c2942); color: rgb(0, 0, 0); border: 1px solid #ffffff;}")
     # widget.setGeometry(600, 200, 640, 480)
     widget.showFullScreen()
     widget.show()
+    cameras.discover_async()
+    # Once the menu is on screen
+    QTimer.singleShot(0, presentation_loader.load_async)
     
     escape_filter = EscapeFilter()
     app.installEventFilter(escape_filter)
+    app.aboutToQuit.connect(navigator.shutdown)
+    app.aboutToQuit.connect(quiz_store.flush)
+    app.aboutToQuit.connect(detector_pool.close)
     
     sys.exit(app.exec_())
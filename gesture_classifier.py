@@ -0,0 +1,154 @@
+"""
+Presentation key classifier working directly on the hand landmarks.
+
+Instead of drawing the skeleton into an image and running the CNN on a
+256x256 crop, the 21x3 landmarks are normalized (wrist at the origin,
+largest x/y extent scaled to 1) and matched against one centroid per key.
+
+Collect samples and train:
+    python gesture_classifier.py collect samples.npz
+    python gesture_classifier.py train samples.npz [model/presentation_keys_landmarks.npz]
+"""
+
+import os
+import sys
+
+import numpy as np
+
+from inference import KEY_LABELS
+
+
+LANDMARK_MODEL_PATH = 'model/presentation_keys_landmarks.npz'
+
+
+def normalize_landmarks(lmList):
+    """
+    :param lmList: 21 landmarks as [x, y, z] in pixels
+    :return: Flat float32 vector of 63 values, translation and scale invariant
+    """
+    points = np.asarray(lmList, np.float32)[:, :3]
+    points = points - points[0]
+    scale = np.abs(points[:, :2]).max()
+    if scale:
+        points /= scale
+    return points.ravel()
+
+
+class LandmarkClassifier:
+    """
+    Nearest-centroid classifier over normalized landmark vectors. Distances
+    are turned into probabilities with a softmax, in KEY_LABELS order, so it
+    is a drop-in replacement for the CNN output.
+    """
+
+    def __init__(self, centroids, labels, temperature):
+        """
+        :param centroids: Array of shape (n_labels, 63)
+        :param labels: Label of each centroid
+        :param temperature: Softmax temperature applied to the squared distances
+        """
+        self.centroids = np.asarray(centroids, np.float32)
+        self.labels = [str(label) for label in labels]
+        self.temperature = float(temperature)
+        self.output_index = np.array([KEY_LABELS.index(label) for label in self.labels])
+
+    @classmethod
+    def fit(cls, samples, sample_labels):
+        """
+        :param samples: Array of shape (n, 63) from normalize_landmarks
+        :param sample_labels: Key label of each sample
+        """
+        samples = np.asarray(samples, np.float32)
+        sample_labels = np.asarray(sample_labels)
+        labels = [label for label in KEY_LABELS if np.any(sample_labels == label)]
+        centroids = np.stack([samples[sample_labels == label].mean(0) for label in labels])
+        within = [((samples[sample_labels == label] - centroid) ** 2).sum(1)
+                  for label, centroid in zip(labels, centroids)]
+        temperature = max(float(np.mean(np.concatenate(within))), 1e-3)
+        return cls(centroids, labels, temperature)
+
+    @classmethod
+    def load(cls, path=LANDMARK_MODEL_PATH):
+        data = np.load(path)
+        return cls(data['centroids'], data['labels'], data['temperature'])
+
+    def save(self, path=LANDMARK_MODEL_PATH):
+        np.savez(path, centroids=self.centroids, labels=np.array(self.labels), temperature=self.temperature)
+
+    def predict_vector(self, vector):
+        distances = ((self.centroids - vector) ** 2).sum(1)
+        logits = -distances / self.temperature
+        weights = np.exp(logits - logits.max())
+        probabilities = np.zeros((1, len(KEY_LABELS)), np.float32)
+        probabilities[0, self.output_index] = weights / weights.sum()
+        return probabilities
+
+    def predict(self, lmList):
+        """
+        :param lmList: 21 landmarks as [x, y, z] in pixels
+        :return: Array of shape (1, len(KEY_LABELS))
+        """
+        return self.predict_vector(normalize_landmarks(lmList))
+
+
+def collect(output_path):
+    """
+    Records labelled samples from the camera. Hold 1-5 to label the hand
+    as b/esc/left/right/switch, press q to save and quit.
+    """
+    import cv2
+    from camera import CameraRegistry
+    from HandTrackingModule import HandDetector
+
+    cameras = CameraRegistry()
+    video = cameras.acquire()
+    if video is None:
+        print('No camera available')
+        return
+    detector = HandDetector(maxHands=1)
+    samples, sample_labels = [], []
+
+    while True:
+        success, img = video.read()
+        if not success:
+            continue
+        img = cv2.flip(img, 1)
+        hands, img = detector.findHands(img)
+        cv2.putText(img, f"{len(samples)} samples  1-5: {' '.join(KEY_LABELS)}", (10, 30),
+                    cv2.FONT_HERSHEY_PLAIN, 1.5, (0, 255, 0), 2)
+        cv2.imshow('collect', img)
+
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord('q'):
+            break
+        if hands and ord('1') <= key < ord('1') + len(KEY_LABELS):
+            samples.append(normalize_landmarks(hands[0]['lmList']))
+            sample_labels.append(KEY_LABELS[key - ord('1')])
+
+    cv2.destroyAllWindows()
+    cameras.release(video)
+    np.savez(output_path, samples=np.array(samples, np.float32), labels=np.array(sample_labels))
+    print(f'Saved {len(samples)} samples to {output_path}')
+
+
+def train(samples_path, output_path=LANDMARK_MODEL_PATH):
+    data = np.load(samples_path)
+    samples, sample_labels = data['samples'], data['labels']
+    classifier = LandmarkClassifier.fit(samples, sample_labels)
+    predictions = [classifier.labels[int(np.argmax(classifier.predict_vector(sample)[0, classifier.output_index]))]
+                   for sample in samples]
+    accuracy = np.mean(np.array(predictions) == sample_labels)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    classifier.save(output_path)
+    print(f'Trained on {len(samples)} samples, labels {classifier.labels}, accuracy {accuracy:.3f}')
+    print(f'Saved to {output_path}')
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == 'collect':
+        collect(sys.argv[2])
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'train':
+        train(*sys.argv[2:4])
+    else:
+        print('Usage: python gesture_classifier.py collect <samples.npz>\n'
+              '       python gesture_classifier.py train <samples.npz> [model.npz]')
@@ -0,0 +1,97 @@
+"""
+Table-driven gesture matching.
+
+Gestures are declared in gestures.json as ordered rule sets. Each rule
+maps conditions on the HandState bits to an action, optionally for one
+hand ("Left" or "Right"). The rules are compiled into one lookup table
+per rule set and hand, indexed by the HandState bitmask, so matching a
+hand costs a single list lookup however many gestures there are. The
+first rule that matches wins, like an if/elif chain.
+"""
+
+import json
+
+import numpy as np
+
+from HandTrackingModule import (TIPS_UP, TIPS_SIDE, FINGERS_UP, FINGERS_SIDE, THUMB_RIGHT_POINT,
+                                THUMB_ABOVE_MID_TIP, NUM_STATE_BITS)
+
+
+# Condition name -> (first bit, number of bits)
+FEATURES = {
+    'tips_up': (TIPS_UP, 5),
+    'tips_side': (TIPS_SIDE, 5),
+    'fingers_up': (FINGERS_UP, 1),
+    'fingers_side': (FINGERS_SIDE, 1),
+    'thumb_right_point': (THUMB_RIGHT_POINT, 1),
+    'thumb_above_mid_tip': (THUMB_ABOVE_MID_TIP, 1),
+}
+HAND_TYPES = ('Left', 'Right')
+
+
+def compile_condition(when):
+    """
+    :param when: Dict of feature name -> 0/1, or a list of 0/1/None for the per-finger features
+    :return: (care, value) bitmasks, a state matches when state & care == value
+    """
+    care = value = 0
+    for name, expected in when.items():
+        if name not in FEATURES:
+            raise ValueError(f'Unknown gesture feature "{name}", expected one of {", ".join(FEATURES)}')
+        position, width = FEATURES[name]
+        expected = expected if isinstance(expected, list) else [expected]
+        if len(expected) != width:
+            raise ValueError(f'Gesture feature "{name}" takes {width} values, got {len(expected)}')
+        for i, bit in enumerate(expected):
+            if bit is None:
+                continue
+            care |= 1 << (position + i)
+            if bit:
+                value |= 1 << (position + i)
+    return care, value
+
+
+def check_hand(hand):
+    """
+    :param hand: "hand" of a rule, "any" when it has none
+    :return: The hand, once it is known to be "any", "Left" or "Right"
+    """
+    if hand != 'any' and hand not in HAND_TYPES:
+        raise ValueError(f'Unknown gesture hand "{hand}", expected one of any, {", ".join(HAND_TYPES)}')
+    return hand
+
+
+class GestureRules:
+    def __init__(self, rule_sets):
+        """
+        :param rule_sets: Dict of rule set name -> list of rules, each a dict with
+                          "action", "when" and optionally "hand"
+        """
+        self.tables = {}
+        states = np.arange(1 << NUM_STATE_BITS)
+        for name, rules in rule_sets.items():
+            actions = [None] + [rule['action'] for rule in rules]
+            compiled = [(compile_condition(rule['when']), check_hand(rule.get('hand', 'any'))) for rule in rules]
+            self.tables[name] = {}
+            for handType in HAND_TYPES:
+                table = np.zeros(len(states), np.intp)
+                # Apply the rules backwards so the first matching one ends up in the table
+                for index in range(len(compiled), 0, -1):
+                    (care, value), hand = compiled[index - 1]
+                    if hand in ('any', handType):
+                        table[(states & care) == value] = index
+                self.tables[name][handType] = [actions[i] for i in table.tolist()]
+
+    @classmethod
+    def load(cls, path='gestures.json'):
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(json.load(file))
+
+    def match(self, rule_set, state, handType):
+        """
+        :param rule_set: Name of the rule set, e.g. "presentation_keys"
+        :param state: HandState of the hand
+        :param handType: "Left" or "Right"
+        :return: Action of the first matching rule or None
+        """
+        return self.tables[rule_set]["Left" if handType == "Left" else "Right"][state.mask]
@@ -0,0 +1,129 @@
+"""
+Decoded and scaled images for the quiz screens.
+"""
+
+import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtGui import QImage
+
+
+def fit_pixmap(pixmap, label_height, label_width):
+    width = pixmap.width()
+    height = pixmap.height()
+    pixmap_aspect_ratio = height / width
+    label_aspect_ratio = label_height / label_width
+    
+    if pixmap_aspect_ratio > label_aspect_ratio:
+        k = label_height / height
+        w_cal = math.floor(k * width)
+        img_resize = pixmap.scaled(w_cal, label_height)
+        
+    elif pixmap_aspect_ratio <= label_aspect_ratio:
+        k = label_width / width
+        h_cal = math.floor(k * height)
+        img_resize = pixmap.scaled(label_width, h_cal)
+        
+    return img_resize
+
+
+class ImageCache:
+    """
+    LRU cache of images decoded from disk and scaled to a label size, keyed
+    by (path, mtime, width, height) so an edited file is decoded again.
+    Holds QImages, which unlike QPixmaps can be created on any thread.
+    """
+
+    def __init__(self, budget=64 * 1024 * 1024):
+        """
+        :param budget: Maximum number of bytes of image data to keep
+        """
+        self.budget = budget
+        self.images = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def key(self, path, width, height):
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        return path, mtime, width, height
+
+    def get(self, path, width, height):
+        """
+        :return: Cached QImage or None
+        """
+        key = self.key(path, width, height)
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+            return image
+
+    def load(self, path, width, height):
+        """
+        :return: QImage of the file scaled to fit width x height, None if it can't be read
+        """
+        key = self.key(path, width, height)
+        if key is None or width <= 0 or height <= 0:
+            return None
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+                return image
+
+        image = QImage(path)
+        if image.isNull():
+            return None
+        image = fit_pixmap(image, height, width)
+        self.put(key, image)
+        return image
+
+    def put(self, key, image):
+        with self.lock:
+            if key in self.images:
+                return
+            self.images[key] = image
+            self.size += image.sizeInBytes()
+            while self.size > self.budget and len(self.images) > 1:
+                _, evicted = self.images.popitem(last=False)
+                self.size -= evicted.sizeInBytes()
+
+    def clear(self):
+        with self.lock:
+            self.images.clear()
+            self.size = 0
+
+
+class ImagePrefetcher:
+    """
+    Decodes and scales images into an ImageCache on a thread pool, ahead
+    of the moment they are shown.
+    """
+
+    def __init__(self, cache, workers=2):
+        self.cache = cache
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ImagePrefetch')
+        self.queued = set()
+        self.lock = threading.Lock()
+
+    def prefetch(self, requests):
+        """
+        :param requests: Iterable of (path, width, height)
+        """
+        for request in requests:
+            with self.lock:
+                if request in self.queued or self.cache.get(*request) is not None:
+                    continue
+                self.queued.add(request)
+            future = self.executor.submit(self.cache.load, *request)
+            future.add_done_callback(lambda _, request=request: self.done(request))
+
+    def done(self, request):
+        with self.lock:
+            self.queued.discard(request)
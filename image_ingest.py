@@ -0,0 +1,64 @@
+"""
+Stores uploaded quiz images as display-ready renditions.
+
+Uploads are decoded once, downsized to at most max_side pixels and saved
+as JPEG (PNG when the image has transparency) under a name derived from
+the content hash, so uploading the same picture twice stores it once.
+"""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage
+
+
+def save_image(image, path, format):
+    # Write to a temporary file first so a half written image is never picked up
+    temporary_path = path + '.tmp'
+    if not image.save(temporary_path, format, 90):
+        raise OSError(f'Could not write {path}')
+    os.replace(temporary_path, path)
+
+
+def ingest_image(source_path, target_directory='quiz/images', max_side=1280):
+    """
+    :param source_path: Image picked by the user
+    :param target_directory: Directory the rendition is stored in
+    :param max_side: Longest side of the stored image
+    :return: Path of the stored image with forward slashes
+    """
+    with open(source_path, 'rb') as file:
+        data = file.read()
+    image = QImage()
+    if not image.loadFromData(data):
+        raise ValueError(f'Unsupported image file: {source_path}')
+
+    format = 'PNG' if image.hasAlphaChannel() else 'JPG'
+    name = f'{hashlib.sha1(data).hexdigest()[:16]}.{format.lower()}'
+    target_path = os.path.join(target_directory, name).replace(os.sep, '/')
+    if os.path.exists(target_path):
+        return target_path
+
+    os.makedirs(target_directory, exist_ok=True)
+    if max(image.width(), image.height()) > max_side:
+        image = image.scaled(max_side, max_side, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    save_image(image, target_path, format)
+    return target_path
+
+
+class ImageIngest:
+    """
+    Runs ingest_image off the GUI thread.
+    """
+
+    def __init__(self, target_directory='quiz/images'):
+        self.target_directory = target_directory
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ImageIngest')
+
+    def submit(self, source_path):
+        """
+        :return: Future resolving to the stored image path
+        """
+        return self.executor.submit(ingest_image, source_path, self.target_directory)
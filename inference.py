@@ -0,0 +1,188 @@
+"""
+Inference backends for the presentation key model.
+
+Keras' Model.predict builds a data pipeline on every call, which costs far
+more than the network itself for a single 256x256 image. KeyModel calls
+the network directly (a compiled tf.function or a TFLite interpreter) on
+a preallocated float32 input buffer.
+
+Export the Keras model to TFLite with:
+    python inference.py export model/presentation_keys.h5
+"""
+
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+
+# Order of the model outputs
+KEY_LABELS = ['b', 'esc', 'left', 'right', 'switch']
+
+
+class KerasBackend:
+    def __init__(self, model_path):
+        import tensorflow as tf
+
+        self.model = tf.keras.models.load_model(model_path)
+        self.call = tf.function(lambda batch: self.model(batch, training=False), reduce_retracing=True)
+        self.input_dtype = np.float32
+        self.input_quantization = (0.0, 0)
+
+    def predict(self, batch):
+        return self.call(batch).numpy()
+
+
+class TFLiteBackend:
+    def __init__(self, model_path):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path)
+        self.interpreter.allocate_tensors()
+        details = self.interpreter.get_input_details()[0]
+        self.input_index = details['index']
+        self.input_dtype = details['dtype']
+        # Scale and zero point of an integer input, (0.0, 0) when it isn't quantized
+        self.input_quantization = details['quantization']
+        output = self.interpreter.get_output_details()[0]
+        self.output_index = output['index']
+        self.output_scale, self.output_zero_point = output['quantization']
+        self.batch_size = 1
+
+    def predict(self, batch):
+        if len(batch) != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_index, batch.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = len(batch)
+        self.interpreter.set_tensor(self.input_index, batch)
+        self.interpreter.invoke()
+        result = self.interpreter.get_tensor(self.output_index)
+        if self.output_scale:
+            result = (result.astype(np.float32) - self.output_zero_point) * self.output_scale
+        return result
+
+
+class KeyModel:
+    """
+    Wraps a backend with the preprocessing the model was trained with.
+    """
+
+    def __init__(self, model_path, backend='auto', img_size=256):
+        """
+        :param model_path: Path to the Keras .h5 model
+        :param backend: "keras", "tflite" or "auto" to use the .tflite export when it exists
+        :param img_size: Side of the square input image
+        """
+        tflite_path = os.path.splitext(model_path)[0] + '.tflite'
+        if backend == 'auto':
+            backend = 'tflite' if os.path.exists(tflite_path) else 'keras'
+        if backend == 'tflite':
+            self.backend = TFLiteBackend(tflite_path)
+        else:
+            self.backend = KerasBackend(model_path)
+        self.img_size = img_size
+        self.input = np.empty((1, img_size, img_size, 3), self.backend.input_dtype)
+        self.input_quantization = self.backend.input_quantization
+        self.lock = threading.Lock()
+
+    def preprocess(self, images, out):
+        if out.dtype.kind == 'f':
+            np.multiply(images, np.float32(1 / 255), out=out)
+            return out
+        # Integer input: the model was trained on images / 255, quantized as value / scale + zero_point
+        scale, zero_point = self.input_quantization
+        if not scale or (np.isclose(scale, 1 / 255) and zero_point == 0):
+            out[:] = images
+        else:
+            limits = np.iinfo(out.dtype)
+            quantized = np.rint(images * np.float32(1 / (255 * scale)) + zero_point)
+            out[:] = np.clip(quantized, limits.min, limits.max)
+        return out
+
+    def predict(self, img):
+        """
+        :param img: uint8 image of img_size x img_size
+        :return: Array of shape (1, len(KEY_LABELS)) with the class probabilities
+        """
+        with self.lock:
+            self.preprocess(img, self.input[0])
+            return self.backend.predict(self.input)
+
+    def predict_batch(self, images):
+        """
+        :param images: uint8 array of shape (n, img_size, img_size, 3)
+        """
+        batch = np.empty((len(images), self.img_size, self.img_size, 3), self.backend.input_dtype)
+        with self.lock:
+            return self.backend.predict(self.preprocess(images, batch))
+
+
+class BatchingKeyModel:
+    """
+    Optional micro-batching front of a KeyModel: requests arriving within
+    `window` seconds of each other are run as one batch on a worker thread.
+    """
+
+    def __init__(self, model, window=0.005, max_batch=8):
+        self.model = model
+        self.window = window
+        self.max_batch = max_batch
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self.worker, name='KeyModelBatcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, img):
+        future = Future()
+        self.requests.put((img, future))
+        return future
+
+    def predict(self, img):
+        return self.submit(img).result()
+
+    def worker(self):
+        while True:
+            pending = [self.requests.get()]
+            try:
+                while len(pending) < self.max_batch:
+                    pending.append(self.requests.get(timeout=self.window))
+            except queue.Empty:
+                pass
+
+            try:
+                result = self.model.predict_batch(np.stack([img for img, _ in pending]))
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            for i, (_, future) in enumerate(pending):
+                future.set_result(result[i:i + 1])
+
+
+def export_tflite(model_path, output_path=None, optimize=False):
+    """
+    Converts the Keras model to TFLite, keeping the float32 input.
+    :param optimize: Apply dynamic range quantization to the weights
+    """
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if optimize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    output_path = output_path or os.path.splitext(model_path)[0] + '.tflite'
+    with open(output_path, 'wb') as file:
+        file.write(converter.convert())
+    return output_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == 'export':
+        print(export_tflite(sys.argv[2], optimize='--optimize' in sys.argv))
+    else:
+        print('Usage: python inference.py export <model.h5> [--optimize]')
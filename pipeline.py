@@ -0,0 +1,457 @@
+"""
+Pipeline helpers shared by the Presentation and Quiz worker threads.
+"""
+
+import csv
+import json
+import math
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+def fit_size(width, height, label_width, label_height):
+    """
+    Size of a width x height image scaled to fit the label, keeping its
+    aspect ratio (same rounding as fit_pixmap).
+    """
+    if height / width > label_height / label_width:
+        return math.floor(label_height / height * width), label_height
+    return label_width, math.floor(label_width / width * height)
+
+
+class FramePresenter:
+    """
+    Hands frames from a worker thread to the UI. The worker converts each
+    frame to RGB, scaled to the label when a target size is set, into one
+    of three reusable buffers, so the UI only has to wrap it in a QImage.
+
+    Only the newest frame is kept: the worker overwrites the pending one,
+    so the UI can never fall behind by more than a frame. The buffer the
+    UI is displaying and the pending one are never written to.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffers = [None, None, None]
+        self.scaled = None
+        self.pending = None
+        self.displaying = None
+        self.target_size = None
+
+    def set_target_size(self, width, height):
+        """
+        :param width: Width of the label the frames are shown in, None to keep the frame size
+        """
+        with self.lock:
+            self.target_size = (width, height) if width and height else None
+
+    def publish(self, frame):
+        """
+        :param frame: BGR frame from the worker
+        :return: True if the UI has to be notified, False if a frame was already pending
+        """
+        h, w = frame.shape[:2]
+        with self.lock:
+            target_size = self.target_size
+            index = next(i for i in range(3) if i != self.pending and i != self.displaying)
+
+        size = fit_size(w, h, *target_size) if target_size else (w, h)
+        buffer = self.buffers[index]
+        if buffer is None or buffer.shape[1::-1] != size:
+            buffer = self.buffers[index] = np.empty((size[1], size[0], 3), np.uint8)
+
+        if size != (w, h):
+            if self.scaled is None or self.scaled.shape[1::-1] != size:
+                self.scaled = np.empty_like(buffer)
+            cv2.resize(frame, size, dst=self.scaled, interpolation=cv2.INTER_AREA)
+            frame = self.scaled
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=buffer)
+
+        with self.lock:
+            was_empty = self.pending is None
+            self.pending = index
+        return was_empty
+
+    def take(self):
+        """
+        :return: Newest RGB frame, or None. It stays reserved until release() is called.
+        """
+        with self.lock:
+            self.displaying = self.pending
+            self.pending = None
+            return None if self.displaying is None else self.buffers[self.displaying]
+
+    def release(self):
+        with self.lock:
+            self.displaying = None
+
+    def clear(self):
+        with self.lock:
+            self.pending = None
+            self.displaying = None
+
+
+class RingTimings:
+    """
+    Durations per key (a stage, an action...) kept in fixed size numpy
+    ring buffers, so recording can stay on in the field.
+    """
+
+    def __init__(self, name, size=600, directory=None):
+        """
+        :param name: Used in the exported file names
+        :param size: Number of durations kept per key
+        :param directory: Where export() writes, defaults to PROFILE_DIR
+        """
+        self.name = name
+        self.size = size
+        self.directory = directory if directory is not None else os.environ.get('PROFILE_DIR')
+        self.rings = {}
+        self.counts = {}
+
+    def record(self, key, duration):
+        ring = self.rings.get(key)
+        if ring is None:
+            ring = self.rings[key] = np.zeros(self.size)
+            self.counts[key] = 0
+        ring[self.counts[key] % self.size] = duration
+        self.counts[key] += 1
+
+    def durations_ms(self, key):
+        return self.rings[key][:min(self.counts[key], self.size)] * 1000
+
+    def summary(self):
+        """
+        :return: Dict of key to count and mean/p50/p95/p99/max duration in ms
+        """
+        result = {}
+        for key in self.rings:
+            durations = self.durations_ms(key)
+            p50, p95, p99 = np.percentile(durations, (50, 95, 99))
+            result[key] = {
+                'count': self.counts[key],
+                'mean_ms': round(float(durations.mean()), 3),
+                'p50_ms': round(float(p50), 3),
+                'p95_ms': round(float(p95), 3),
+                'p99_ms': round(float(p99), 3),
+                'max_ms': round(float(durations.max()), 3),
+            }
+        return result
+
+    def export(self, directory=None):
+        """
+        Writes the summary as <name>-<time>.csv and .json.
+        :param directory: Defaults to the directory given at construction, nothing is written if there is none
+        :return: Paths written
+        """
+        directory = directory or self.directory
+        if not directory or not self.rings:
+            return []
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}")
+        summary = self.summary()
+
+        with open(base + '.json', 'w') as file:
+            json.dump({'name': self.name, **summary}, file, indent=2)
+        rows = {key: values for key, values in summary.items() if isinstance(values, dict)}
+        fields = list(dict.fromkeys(field for values in rows.values() for field in values))
+        with open(base + '.csv', 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['key'] + fields)
+            for key, values in rows.items():
+                writer.writerow([key] + [values.get(field, '') for field in fields])
+        return [base + '.json', base + '.csv']
+
+
+class StageProfiler(RingTimings):
+    """
+    Time spent in each stage of a worker loop. Each lap() charges the time
+    since the previous lap (or begin()) to a stage; end() closes the frame
+    and records its total as the "frame" stage.
+
+    PROFILE_OVERLAY=1 draws p50/p95/p99 and fps on the frames, PROFILE_DIR
+    makes export() write the summary there as CSV and JSON.
+    """
+
+    def __init__(self, name, size=600, overlay=None, directory=None):
+        """
+        :param name: Name of the loop, used in the exported file names
+        :param size: Number of frames kept per stage
+        :param overlay: Draw the summary on the frames, defaults to PROFILE_OVERLAY
+        """
+        super().__init__(name, size, directory)
+        self.overlay = overlay if overlay is not None else os.environ.get('PROFILE_OVERLAY') == '1'
+        self.frame_ends = np.zeros(size)
+        self.frames = 0
+        self.current = {}
+        self.frame_start = None
+        self.last = None
+        self.overlay_lines = []
+        self.overlay_time = 0.0
+
+    @property
+    def enabled(self):
+        """
+        Whether PROFILE_OVERLAY or PROFILE_DIR asked for the timings to be shown
+        """
+        return self.overlay or bool(self.directory)
+
+    def begin(self):
+        self.frame_start = self.last = time.perf_counter()
+        self.current.clear()
+
+    def lap(self, stage):
+        if self.last is None:
+            return
+        now = time.perf_counter()
+        self.current[stage] = self.current.get(stage, 0.0) + now - self.last
+        self.last = now
+
+    def cancel(self):
+        """
+        Drops the frame begun last, e.g. when no frame could be captured.
+        """
+        self.frame_start = self.last = None
+
+    def end(self):
+        if self.frame_start is None:
+            return
+        now = time.perf_counter()
+        self.current['frame'] = now - self.frame_start
+        for stage, duration in self.current.items():
+            self.record(stage, duration)
+        self.frame_ends[self.frames % self.size] = now
+        self.frames += 1
+        self.frame_start = self.last = None
+
+    def fps(self):
+        n = min(self.frames, self.size)
+        if n < 2:
+            return 0.0
+        ends = self.frame_ends[:n]
+        return (n - 1) / (ends.max() - ends.min())
+
+    def summary(self):
+        """
+        :return: Dict of stage to frame count and mean/p50/p95/p99/max time in ms, plus "fps"
+        """
+        result = super().summary()
+        result['fps'] = round(float(self.fps()), 1)
+        return result
+
+    def draw(self, img, interval=0.5):
+        """
+        Draws the summary on img, refreshed every interval seconds.
+        """
+        now = time.perf_counter()
+        if now - self.overlay_time >= interval:
+            self.overlay_time = now
+            summary = self.summary()
+            self.overlay_lines = [f"{summary.pop('fps')} fps   p50 / p95 / p99 ms"]
+            self.overlay_lines += [f"{stage}: {values['p50_ms']:.1f} / {values['p95_ms']:.1f} / {values['p99_ms']:.1f}"
+                                   for stage, values in summary.items()]
+        for i, line in enumerate(self.overlay_lines):
+            cv2.putText(img, line, (10, 20 + 18 * i), cv2.FONT_HERSHEY_PLAIN, 1.1, (0, 255, 255), 1)
+
+
+class LatencyTracker(RingTimings):
+    """
+    Motion-to-action latency: the time from the capture of a frame to the
+    mouse move, key press or answer it caused, per action type. Dwell times
+    that gestures are held for on purpose are not included, the latency is
+    measured from the frame that completed the gesture.
+    """
+
+    # Upper bounds of the histogram buckets in ms, the last one is open
+    BUCKETS_MS = (25, 50, 75, 100, 150, 200, 300, 500, 1000)
+
+    def __init__(self, name, size=600, directory=None):
+        super().__init__(name, size, directory)
+        self.capture_time = None
+
+    def frame(self, capture_time):
+        """
+        :param capture_time: time.perf_counter() when the frame being processed was captured
+        """
+        self.capture_time = capture_time
+
+    def action(self, action):
+        """
+        Records the latency of an action caused by the current frame.
+        """
+        if self.capture_time is not None:
+            self.record(action, time.perf_counter() - self.capture_time)
+
+    def summary(self):
+        """
+        :return: Like RingTimings.summary, with a histogram of the kept latencies per action
+        """
+        result = super().summary()
+        edges = np.array((0,) + self.BUCKETS_MS + (np.inf,))
+        for action, values in result.items():
+            counts, _ = np.histogram(self.durations_ms(action), edges)
+            labels = [f'<{bound}ms' for bound in self.BUCKETS_MS] + [f'>={self.BUCKETS_MS[-1]}ms']
+            values.update(zip(labels, counts.tolist()))
+        return result
+
+
+class DetectionGovernor:
+    """
+    Picks how often hand detection runs from the application state: every
+    frame while a gesture is confirmed, less often during cooldowns and
+    when no hands have been seen for a while.
+    """
+
+    def __init__(self, tracking_interval=0.0, cooldown_interval=0.25, idle_interval=0.2, idle_after=1.0):
+        """
+        :param tracking_interval: Seconds between detections while a hand is in view
+        :param cooldown_interval: Seconds between detections during a cooldown
+        :param idle_interval: Seconds between detections when no hands are seen
+        :param idle_after: Seconds without hands before switching to idle_interval
+        """
+        self.tracking_interval = tracking_interval
+        self.cooldown_interval = cooldown_interval
+        self.idle_interval = idle_interval
+        self.idle_after = idle_after
+        self.last_detection = float('-inf')
+        self.last_seen = float('-inf')
+        self.skipped = 0
+        self.detected = 0
+
+    def should_detect(self, now, confirming=False, cooldown=False):
+        """
+        :param now: Current time in seconds
+        :param confirming: A gesture is waiting for confirmation, always detect
+        :param cooldown: Detection results can't answer for now
+        """
+        if confirming:
+            interval = 0
+        elif cooldown:
+            interval = self.cooldown_interval
+        elif now - self.last_seen > self.idle_after:
+            interval = self.idle_interval
+        else:
+            interval = self.tracking_interval
+
+        if now - self.last_detection >= interval:
+            self.last_detection = now
+            self.detected += 1
+            return True
+        self.skipped += 1
+        return False
+
+    def seen(self, hands, now):
+        if hands:
+            self.last_seen = now
+
+
+class GestureConfirmer:
+    """
+    Confirms a gesture from the votes of consecutive detections instead of
+    two samples a fixed time apart. Every detection votes for the gesture it
+    sees, weighted by its confidence and by how still the hand is: a steady,
+    confident hand confirms in a few frames, a moving or uncertain one takes
+    longer and a hand moving faster than moving_speed never confirms. A vote
+    for another gesture is subtracted from the candidate's evidence and
+    takes over when it runs out, so flicker delays a confirmation instead of
+    going unnoticed. No gesture, or one below min_confidence, starts over.
+
+    The confidence has to come from something that scores the gesture
+    itself, like the key classifier. Gestures found by the rules alone have
+    no such score and vote with confidence 1, so only stability weighs them.
+    """
+
+    def __init__(self, threshold=4.0, min_dwell=0.1, min_confidence=0.0, still_speed=0.3, moving_speed=2.0,
+                 repeat=True):
+        """
+        :param threshold: Evidence needed, one steady and fully confident frame adds 1
+        :param min_dwell: Seconds the candidate has to be held at least, whatever the frame rate
+        :param min_confidence: Votes with a lower confidence count as no gesture
+        :param still_speed: Landmark speed in hand sizes per second up to which a hand counts as still
+        :param moving_speed: Landmark speed in hand sizes per second from which votes count nothing
+        :param repeat: Keep confirming a gesture that is held, else it is ignored until another
+            gesture or none is seen
+        """
+        self.threshold = threshold
+        self.min_dwell = min_dwell
+        self.min_confidence = min_confidence
+        self.still_speed = still_speed
+        self.moving_speed = moving_speed
+        self.repeat = repeat
+        self.previous = None
+        self.previous_time = None
+        self.reset()
+
+    def reset(self):
+        self.candidate = None
+        self.evidence = 0.0
+        self.since = None
+        # Gesture confirmed last with repeat off, ignored while it is held
+        self.released = None
+
+    @property
+    def confirming(self):
+        return self.candidate is not None
+
+    @property
+    def progress(self):
+        """
+        :return: Share of the threshold the candidate has gathered, 0 to 1
+        """
+        return min(self.evidence / self.threshold, 1.0) if self.confirming else 0.0
+
+    def stability(self, landmarks, now):
+        """
+        :return: 1 for a still hand down to 0 at moving_speed, 0.5 on the first frame of a hand
+            and 1 without landmarks
+        """
+        previous, previous_time = self.previous, self.previous_time
+        if landmarks is None:
+            self.previous = self.previous_time = None
+            return 1.0
+        points = np.array(landmarks, np.float32)[:, :2]
+        self.previous, self.previous_time = points, now
+        if previous is None or now <= previous_time:
+            return 0.5
+        size = max(float(np.ptp(points, axis=0).max()), 1.0)
+        speed = float(np.linalg.norm(points - previous, axis=1).mean()) / size / (now - previous_time)
+        return float(np.clip((self.moving_speed - speed) / (self.moving_speed - self.still_speed), 0.0, 1.0))
+
+    def update(self, gesture, now, landmarks=None, confidence=1.0):
+        """
+        Adds the vote of one detection.
+        :param gesture: Gesture seen, None or empty for none
+        :param now: Time of the detection in seconds
+        :param landmarks: Landmarks of the hand making the gesture, shape (21, 2+)
+        :param confidence: Confidence of the gesture, 0 to 1
+        :return: The gesture when it got confirmed by this vote, None otherwise
+        """
+        weight = confidence * self.stability(landmarks, now)
+        if not gesture or confidence < self.min_confidence:
+            self.reset()
+            return None
+        if self.released is not None:
+            if gesture == self.released:
+                return None
+            self.released = None
+
+        if gesture == self.candidate:
+            self.evidence += weight
+        else:
+            self.evidence -= weight
+            if self.evidence <= 0:
+                self.candidate = gesture
+                self.evidence = -self.evidence
+                self.since = now
+
+        if self.evidence >= self.threshold and now - self.since >= self.min_dwell:
+            confirmed = self.candidate
+            self.reset()
+            if not self.repeat:
+                self.released = confirmed
+            return confirmed
+        return None
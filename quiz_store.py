@@ -0,0 +1,273 @@
+"""
+SQLite backed storage for the quizzes.
+
+The CSV files in the quiz directory stay the exchange format: a CSV that
+is new, or newer than its last import, is imported on access, and edits
+made through the store are written back to the CSV by flush(). Questions
+are addressed by (quiz, position), so reading or updating one question
+does not touch the rest of the quiz.
+"""
+
+import csv
+import os
+import sqlite3
+import threading
+
+
+QUIZ_FIELDS = ['question_text', 'question_image', 'choice_type', 'answer', 'choice1', 'choice2',
+               'choice3', 'choice4']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quizzes (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    csv_mtime REAL,
+    dirty INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS questions (
+    quiz_id INTEGER NOT NULL REFERENCES quizzes(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    question_text TEXT, question_image TEXT, choice_type TEXT, answer TEXT,
+    choice1 TEXT, choice2 TEXT, choice3 TEXT, choice4 TEXT,
+    PRIMARY KEY (quiz_id, position)
+) WITHOUT ROWID;
+"""
+
+
+class QuizStore:
+    def __init__(self, directory='quiz', database='quiz.db'):
+        """
+        :param directory: Directory holding the quiz CSV files
+        :param database: File name of the SQLite database inside directory
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(directory, database), check_same_thread=False)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.RLock()
+        # Bumped on every change of a quiz, so cached copies know when to reload
+        self.versions = {}
+        self.names_version = 0
+
+    def changed(self, name, listing=False):
+        """
+        :param listing: The quiz was added or removed
+        """
+        with self.lock:
+            self.versions[name] = self.versions.get(name, 0) + 1
+            if listing:
+                self.names_version += 1
+
+    def version(self, name):
+        return self.versions.get(name, 0)
+
+    def csv_path(self, name):
+        return os.path.join(self.directory, f'{name}.csv')
+
+    def csv_mtime(self, name):
+        try:
+            return os.path.getmtime(self.csv_path(name))
+        except OSError:
+            return None
+
+    def quiz_id(self, name):
+        """
+        :return: Id of the quiz, importing or re-importing its CSV when needed. None if it doesn't exist.
+        """
+        with self.lock:
+            row = self.connection.execute('SELECT id, csv_mtime, dirty FROM quizzes WHERE name = ?',
+                                          (name,)).fetchone()
+            mtime = self.csv_mtime(name)
+            if row is not None and (row[2] or mtime is None or mtime == row[1]):
+                return row[0]
+            if mtime is None:
+                return None
+            return self.import_csv(name)
+
+    def sync(self):
+        """
+        Imports every CSV in the directory that is new or changed since its last import.
+        """
+        for file in os.listdir(self.directory):
+            if file.endswith('.csv'):
+                self.quiz_id(os.path.splitext(file)[0])
+
+    def names(self):
+        self.sync()
+        with self.lock:
+            return [name for name, in self.connection.execute('SELECT name FROM quizzes ORDER BY name')]
+
+    def count(self, name):
+        quiz_id = self.quiz_id(name)
+        if quiz_id is None:
+            return 0
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM questions WHERE quiz_id = ?',
+                                           (quiz_id,)).fetchone()[0]
+
+    def question(self, name, position):
+        """
+        :param position: 1 based question number
+        :return: Row as a list of QUIZ_FIELDS values, or None
+        """
+        quiz_id = self.quiz_id(name)
+        with self.lock:
+            row = self.connection.execute(f'SELECT {", ".join(QUIZ_FIELDS)} FROM questions '
+                                          'WHERE quiz_id = ? AND position = ?', (quiz_id, position)).fetchone()
+        return list(row) if row else None
+
+    def questions(self, name):
+        """
+        :return: All rows of the quiz in order
+        """
+        quiz_id = self.quiz_id(name)
+        with self.lock:
+            rows = self.connection.execute(f'SELECT {", ".join(QUIZ_FIELDS)} FROM questions '
+                                           'WHERE quiz_id = ? ORDER BY position', (quiz_id,)).fetchall()
+        return [list(row) for row in rows]
+
+    def save_question(self, name, position, row):
+        """
+        Replaces the question at position, or appends it when position is past the end.
+        """
+        row = [str(value) for value in row]
+        with self.lock, self.connection:
+            quiz_id = self.quiz_id(name)
+            count = self.connection.execute('SELECT COUNT(*) FROM questions WHERE quiz_id = ?',
+                                            (quiz_id,)).fetchone()[0]
+            self.connection.execute(f'INSERT OR REPLACE INTO questions (quiz_id, position, {", ".join(QUIZ_FIELDS)}) '
+                                    f'VALUES (?, ?{", ?" * len(QUIZ_FIELDS)})',
+                                    [quiz_id, min(position, count + 1)] + row)
+            self.connection.execute('UPDATE quizzes SET dirty = 1 WHERE id = ?', (quiz_id,))
+        self.changed(name)
+
+    def delete_question(self, name, position):
+        with self.lock, self.connection:
+            quiz_id = self.quiz_id(name)
+            self.connection.execute('DELETE FROM questions WHERE quiz_id = ? AND position = ?', (quiz_id, position))
+            # Shift through negative positions so the primary key is never violated mid-update
+            self.connection.execute('UPDATE questions SET position = 1 - position '
+                                    'WHERE quiz_id = ? AND position > ?', (quiz_id, position))
+            self.connection.execute('UPDATE questions SET position = -position '
+                                    'WHERE quiz_id = ? AND position < 0', (quiz_id,))
+            self.connection.execute('UPDATE quizzes SET dirty = 1 WHERE id = ?', (quiz_id,))
+        self.changed(name)
+
+    def create_quiz(self, name):
+        with open(self.csv_path(name), 'w', newline='', encoding='utf-8') as file:
+            csv.writer(file).writerow(QUIZ_FIELDS)
+        self.quiz_id(name)
+
+    def delete_quiz(self, name):
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM quizzes WHERE name = ?', (name,))
+        if os.path.exists(self.csv_path(name)):
+            os.remove(self.csv_path(name))
+        self.changed(name, listing=True)
+
+    def import_csv(self, name):
+        path = self.csv_path(name)
+        with open(path, 'r', newline='', encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))
+        with self.lock, self.connection:
+            new = self.connection.execute('DELETE FROM quizzes WHERE name = ?', (name,)).rowcount == 0
+            quiz_id = self.connection.execute('INSERT INTO quizzes (name, csv_mtime) VALUES (?, ?)',
+                                              (name, os.path.getmtime(path))).lastrowid
+            self.connection.executemany(
+                f'INSERT INTO questions (quiz_id, position, {", ".join(QUIZ_FIELDS)}) '
+                f'VALUES (?, ?{", ?" * len(QUIZ_FIELDS)})',
+                ([quiz_id, position] + [row.get(field) or '' for field in QUIZ_FIELDS]
+                 for position, row in enumerate(rows, 1)))
+        self.changed(name, listing=new)
+        return quiz_id
+
+    def export_csv(self, name, path=None):
+        """
+        Writes the quiz as CSV, to its own file in the quiz directory by default.
+        """
+        rows = self.questions(name)
+        path = path or self.csv_path(name)
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(QUIZ_FIELDS)
+            writer.writerows(rows)
+        if path == self.csv_path(name):
+            with self.lock, self.connection:
+                self.connection.execute('UPDATE quizzes SET csv_mtime = ?, dirty = 0 WHERE name = ?',
+                                        (os.path.getmtime(path), name))
+
+    def flush(self):
+        """
+        Writes every quiz edited since the last flush back to its CSV file.
+        """
+        with self.lock:
+            dirty = [name for name, in self.connection.execute('SELECT name FROM quizzes WHERE dirty = 1')]
+        for name in dirty:
+            self.export_csv(name)
+
+
+class Question:
+    """
+    One quiz question. Instances are shared between the screens and the
+    Quiz thread and never modified.
+    """
+    __slots__ = QUIZ_FIELDS
+
+    def __init__(self, row):
+        """
+        :param row: Values in QUIZ_FIELDS order
+        """
+        for field, value in zip(QUIZ_FIELDS, row):
+            setattr(self, field, value)
+        self.answer = int(self.answer)
+
+    @property
+    def choices(self):
+        return self.choice1, self.choice2, self.choice3, self.choice4
+
+
+class QuizCatalog:
+    """
+    Quizzes loaded once and shared by every screen and the Quiz thread.
+    A quiz is reloaded when it changed through the store or its CSV file
+    changed on disk.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.quizzes = {}
+        self.quiz_names = None
+        self.names_key = None
+        self.lock = threading.Lock()
+
+    def names(self):
+        """
+        :return: Names of all quizzes
+        """
+        try:
+            directory_mtime = os.path.getmtime(self.store.directory)
+        except OSError:
+            directory_mtime = None
+        with self.lock:
+            key = (directory_mtime, self.store.names_version)
+            if self.quiz_names is None or key != self.names_key:
+                self.quiz_names = self.store.names()
+                self.names_key = (directory_mtime, self.store.names_version)
+            return list(self.quiz_names)
+
+    def questions(self, name):
+        """
+        :return: Tuple of Question, empty if the quiz doesn't exist
+        """
+        # quiz_id re-imports the CSV if it changed on disk, which bumps the version
+        self.store.quiz_id(name)
+        version = self.store.version(name)
+        with self.lock:
+            cached = self.quizzes.get(name)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        questions = tuple(Question(row) for row in self.store.questions(name))
+        with self.lock:
+            self.quizzes[name] = (version, questions)
+        return questions
@@ -0,0 +1,317 @@
+"""
+Recording and replay of hand landmarks.
+
+A recording is a .npy file holding one RECORD_DTYPE record per findHands
+call: the time since the first frame, the landmarks in pixels, the
+handedness and its score, and the frame size. It can be opened memory
+mapped, so long recordings cost nothing until they are read.
+
+Record while using the app by pointing LANDMARK_RECORDING at a directory,
+the Presentation and Quiz threads then write <dir>/<mode>-<time>.npy.
+
+Replay drives the Quiz and Presentation logic from a recording on a
+VirtualClock, without camera, MediaPipe or UI, as fast as it runs:
+    python replay.py quiz <recording.npy> <quiz name>
+    python replay.py presentation <recording.npy>
+    python replay.py info <recording.npy>
+"""
+
+import os
+import sys
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+
+from HandTrackingModule import HandDetector
+from inference import KEY_LABELS
+
+
+MAX_HANDS = 2
+
+RECORD_DTYPE = np.dtype([
+    ('timestamp', np.float64),                      # seconds since the first frame
+    ('numHands', np.uint8),
+    ('types', np.uint8, (MAX_HANDS,)),              # 0 Left, 1 Right
+    ('scores', np.float32, (MAX_HANDS,)),           # handedness score
+    ('landmarks', np.int16, (MAX_HANDS, 21, 3)),    # pixels, as HandDetector.landmarks
+    ('width', np.uint16),
+    ('height', np.uint16),
+])
+
+HAND_TYPES = ('Left', 'Right')
+
+
+class LandmarkRecorder:
+    """
+    Collects the hands found by a HandDetector, set as its recorder, and
+    writes them as a recording on close().
+    """
+
+    def __init__(self, path, chunk_size=1024):
+        """
+        :param path: .npy file to write
+        :param chunk_size: Frames preallocated at a time
+        """
+        self.path = path
+        self.chunks = []
+        self.chunk = np.zeros(chunk_size, RECORD_DTYPE)
+        self.count = 0
+        self.start = None
+
+    @classmethod
+    def from_env(cls, name):
+        """
+        :return: Recorder writing to the LANDMARK_RECORDING directory, None if it isn't set
+        """
+        directory = os.environ.get('LANDMARK_RECORDING')
+        if not directory:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        return cls(os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.npy"))
+
+    def record(self, landmarks, types, scores, width, height, timestamp=None):
+        """
+        :param landmarks: Array of shape (n, 21, 3) in pixels
+        :param types: "Left" or "Right" for each hand
+        :param scores: Handedness score of each hand
+        :param timestamp: Seconds, time.perf_counter() by default
+        """
+        now = time.perf_counter() if timestamp is None else timestamp
+        if self.start is None:
+            self.start = now
+        if self.count == len(self.chunk):
+            self.chunks.append(self.chunk)
+            self.chunk = np.zeros(len(self.chunk), RECORD_DTYPE)
+            self.count = 0
+
+        n = min(len(landmarks), MAX_HANDS)
+        i = self.count
+        self.chunk['timestamp'][i] = now - self.start
+        self.chunk['numHands'][i] = n
+        self.chunk['types'][i, :n] = [HAND_TYPES.index(handType) for handType in types[:n]]
+        self.chunk['scores'][i, :n] = scores[:n]
+        self.chunk['landmarks'][i, :n] = landmarks[:n]
+        self.chunk['width'][i] = width
+        self.chunk['height'][i] = height
+        self.count += 1
+
+    def close(self):
+        """
+        :return: Path of the recording, None if nothing was recorded
+        """
+        frames = np.concatenate(self.chunks + [self.chunk[:self.count]])
+        self.chunks = []
+        self.count = 0
+        if not len(frames):
+            return None
+        # Written next to the target first, so a crash never leaves a truncated recording
+        with open(self.path + '.tmp', 'wb') as file:
+            np.save(file, frames)
+        os.replace(self.path + '.tmp', self.path)
+        return self.path
+
+
+def load_recording(path):
+    """
+    :return: Memory mapped array of RECORD_DTYPE
+    """
+    frames = np.load(path, mmap_mode='r')
+    if frames.dtype != RECORD_DTYPE:
+        raise ValueError(f'{path} is not a landmark recording')
+    return frames
+
+
+class VirtualClock:
+    """
+    Drop-in for time.time whose time only moves when set, to the
+    timestamps of the recording being replayed.
+    """
+
+    def __init__(self, now=0.0):
+        self.now = float(now)
+
+    def __call__(self):
+        return self.now
+
+    def set(self, now):
+        self.now = float(now)
+
+
+class ReplayDetector(HandDetector):
+    """
+    HandDetector returning the hands of a recording instead of running
+    MediaPipe. The replay loop picks the frame with seek(). Nothing is
+    drawn and findHands(getLms=True) returns no MediaPipe landmarks.
+    """
+
+    def __init__(self, frames, maxHands=2):
+        # findHands reads the recording, so the graph is never run
+        super().__init__(maxHands=maxHands, hands=SimpleNamespace(close=lambda: None))
+        self.frames = frames
+        self.index = 0
+
+    def seek(self, index):
+        self.index = index
+
+    def findHands(self, img, draw=True, flipType=True, getLms=False):
+        frame = self.frames[self.index]
+        n = self.numHands = min(int(frame['numHands']), self.maxHands)
+        landmarks = self.landmarks[:n]
+        landmarks[:] = frame['landmarks'][:n]
+        bboxes = self.bboxes[:n]
+        bboxes[:, :2] = landmarks[:, :, :2].min(axis=1)
+        bboxes[:, 2:] = landmarks[:, :, :2].max(axis=1)
+
+        allHands = []
+        for i in range(n):
+            xmin, ymin, xmax, ymax = bboxes[i].tolist()
+            bbox = xmin, ymin, xmax - xmin, ymax - ymin
+            allHands.append({
+                "lmList": landmarks[i],
+                "bbox": bbox,
+                "center": (xmin + bbox[2] // 2, ymin + bbox[3] // 2),
+                "type": HAND_TYPES[frame['types'][i]],
+            })
+        # The predicates like tipsUp check for hands in the results
+        self.results = SimpleNamespace(multi_hand_landmarks=[hand["lmList"] for hand in allHands] or None)
+        if getLms:
+            return allHands, img, None
+        return allHands, img
+
+
+class ActionLog:
+    """
+    Stands in for the pynput mouse and keyboard controllers during a
+    replay, keeping what the Presentation did at which virtual time.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.actions = []
+        self.mouse_position = (0, 0)
+
+    @property
+    def position(self):
+        return self.mouse_position
+
+    @position.setter
+    def position(self, position):
+        self.mouse_position = position
+        self.actions.append((self.clock(), 'move', position))
+
+    def click(self, button, count=1):
+        self.actions.append((self.clock(), f'{button}_click', count))
+
+    def press(self, key):
+        self.actions.append((self.clock(), 'press', key))
+
+    def release(self, key):
+        pass
+
+
+class AcceptAllModel:
+    """
+    Key model for replays without the landmark classifier: every key the
+    gesture rules find is confirmed, so only the state machine is tested.
+    """
+
+    def predict(self, lmList):
+        return np.ones((1, len(KEY_LABELS)), np.float32)
+
+
+def replay(frames, target, clock):
+    """
+    Steps target (a Quiz or Presentation) through every frame.
+    :return: Number of frames stepped and the wall time it took
+    """
+    img = np.zeros((int(frames['height'][0]), int(frames['width'][0]), 3), np.uint8)
+    start = time.perf_counter()
+    stepped = 0
+    for i, timestamp in enumerate(frames['timestamp']):
+        if not target.running:
+            break
+        clock.set(timestamp)
+        target.detector.seek(i)
+        target.step(img)
+        stepped += 1
+    return stepped, time.perf_counter() - start
+
+
+def speed(frames, stepped, elapsed):
+    duration = float(frames['timestamp'][stepped - 1]) if stepped else 0.0
+    return {'frames': stepped, 'recorded_s': round(duration, 2), 'replay_s': round(elapsed, 4),
+            'speedup': round(duration / elapsed, 1) if elapsed else 0.0}
+
+
+def replay_quiz(path, quiz_name):
+    """
+    :return: Dict with the quiz outcome and the replay speed
+    """
+    import composite
+
+    frames = load_recording(path)
+    clock = VirtualClock(frames['timestamp'][0])
+    quiz = composite.Quiz(clock=clock)
+    quiz.detector = ReplayDetector(frames, maxHands=composite.QUIZ_DETECTOR['maxHands'])
+    quiz.import_quiz_data(quiz_name)
+    answered = []
+    finished = []
+    quiz.question_signal.connect(lambda qNo: answered.append((clock(), qNo)))
+    quiz.finish_signal.connect(lambda name, score, hands_unseen: finished.append((score, hands_unseen)))
+
+    stepped, elapsed = replay(frames, quiz, clock)
+    result = speed(frames, stepped, elapsed)
+    result.update({
+        'chosen_answers': quiz.chosen_answers,
+        'questions_answered': len(answered) + bool(finished),
+        'finished': bool(finished),
+        'score': finished[0][0] if finished else None,
+    })
+    return result
+
+
+def replay_presentation(path, screen_size=(1920, 1080)):
+    """
+    :return: Dict with the count of each action and the replay speed
+    """
+    import composite
+    from gesture_classifier import LandmarkClassifier, LANDMARK_MODEL_PATH
+
+    frames = load_recording(path)
+    clock = VirtualClock(frames['timestamp'][0])
+    presentation = composite.Presentation(clock=clock)
+    presentation.detector = ReplayDetector(frames, maxHands=composite.PRESENTATION_DETECTOR['maxHands'])
+    if os.path.exists(LANDMARK_MODEL_PATH):
+        presentation.landmark_model = LandmarkClassifier.load(LANDMARK_MODEL_PATH)
+    else:
+        presentation.landmark_model = AcceptAllModel()
+    log = ActionLog(clock)
+    presentation.mouse_control = presentation.key_control = log
+    presentation.keys = {name: name for name in ('esc', 'b', 'right', 'left')}
+    presentation.buttons = {'left': 'left', 'right': 'right'}
+    presentation.wScr, presentation.hScr = screen_size
+    presentation.wCam, presentation.hCam = int(frames['width'][0]), int(frames['height'][0])
+
+    stepped, elapsed = replay(frames, presentation, clock)
+    result = speed(frames, stepped, elapsed)
+    result['actions'] = dict(Counter(action if action != 'press' else f'press {detail}'
+                                     for _, action, detail in log.actions))
+    return result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == 'quiz':
+        print(replay_quiz(sys.argv[2], sys.argv[3]))
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'presentation':
+        print(replay_presentation(sys.argv[2]))
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'info':
+        frames = load_recording(sys.argv[2])
+        print(f"{len(frames)} frames, {frames['timestamp'][-1]:.1f} s, "
+              f"{frames['width'][0]}x{frames['height'][0]}, hands per frame: "
+              f"{dict(Counter(frames['numHands'].tolist()))}")
+    else:
+        print('Usage: python replay.py quiz <recording.npy> <quiz name>\n'
+              '       python replay.py presentation <recording.npy>\n'
+              '       python replay.py info <recording.npy>')
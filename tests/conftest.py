@@ -0,0 +1,28 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+@pytest.fixture(scope='session', autouse=True)
+def workdir(tmp_path_factory):
+    """
+    composite loads gestures.json and the ui files relative to the working directory, and
+    creates the quiz database and the compiled forms there when imported. The tests run in a
+    scratch copy of those files, so nothing is written into the repository.
+    """
+    path = tmp_path_factory.mktemp('workdir')
+    shutil.copy(os.path.join(ROOT, 'gestures.json'), path)
+    os.makedirs(path / 'ui')
+    for file in os.listdir(os.path.join(ROOT, 'ui')):
+        if file.endswith('.ui'):
+            shutil.copy(os.path.join(ROOT, 'ui', file), path / 'ui')
+    previous = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(previous)
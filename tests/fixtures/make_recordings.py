@@ -0,0 +1,81 @@
+"""
+Writes the landmark recordings used by tests/test_replay.py, from the
+repository root:
+    python tests/fixtures/make_recordings.py
+"""
+
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+from replay import LandmarkRecorder
+
+
+FIXTURES = os.path.dirname(os.path.abspath(__file__))
+FPS = 30
+WIDTH, HEIGHT = 640, 480
+
+
+def right_hand(thumb_up, fingers_up, offset=(0, 0)):
+    """
+    :param thumb_up: Thumb tip left of its joint, which counts as up for a right hand
+    :param fingers_up: Up or down for index, middle, ring and pinky
+    :return: 21 landmarks in pixels
+    """
+    points = np.zeros((21, 3), np.int16)
+    points[0] = (320, 400, 0)
+    for joint in range(4):
+        points[1 + joint] = (300 - 15 * joint if thumb_up else 340 + 15 * joint, 380 - 10 * joint, 0)
+    for finger, up in enumerate(fingers_up):
+        ys = (300, 260, 230, 200) if up else (300, 260, 280, 300)
+        for joint in range(4):
+            points[5 + 4 * finger + joint] = (290 + 25 * finger, ys[joint], 0)
+    points[:, :2] += np.array(offset, np.int16)
+    return points
+
+
+def record(name, segments):
+    """
+    :param segments: (seconds, function of the frame index returning landmarks or None)
+    """
+    path = os.path.join(FIXTURES, f'{name}.npy')
+    recorder = LandmarkRecorder(path)
+    frame = 0
+    for seconds, hand in segments:
+        for i in range(int(seconds * FPS)):
+            landmarks = hand(i)
+            hands = np.zeros((0, 21, 3)) if landmarks is None else landmarks[None]
+            recorder.record(hands, ['Right'] * len(hands), [0.95] * len(hands), WIDTH, HEIGHT,
+                            timestamp=frame / FPS)
+            frame += 1
+    print(recorder.close())
+
+
+def main():
+    # One second without hands for the quiz's start cooldown, then the answers 1 to 4
+    quiz = [(1.0, lambda i: None)]
+    for answer in range(1, 5):
+        fingers = [finger < answer for finger in range(4)]
+        quiz += [(0.8, lambda i, fingers=fingers: right_hand(False, fingers)), (0.5, lambda i: None)]
+    record('quiz', quiz)
+
+    # The same answer three times, the hand is lowered during each cooldown
+    two = lambda i: right_hand(False, [True, True, False, False])
+    record('quiz_repeat', [(1.0, lambda i: None), (0.5, two), (0.3, lambda i: None), (1.2, two),
+                           (0.3, lambda i: None), (1.2, two), (0.3, lambda i: None)])
+
+    record('presentation', [
+        (1.0, lambda i: right_hand(True, [True] * 4, (2 * i, 0))),        # move
+        (0.3, lambda i: None),
+        (0.3, lambda i: right_hand(False, [False, True, True, True])),    # left click
+        (0.3, lambda i: None),
+        (0.3, lambda i: right_hand(False, [True, False, True, True])),    # right click
+        (0.3, lambda i: None),
+    ])
+
+
+if __name__ == "__main__":
+    main()
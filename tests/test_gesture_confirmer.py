@@ -0,0 +1,104 @@
+import numpy as np
+
+from pipeline import GestureConfirmer
+
+
+FPS = 30
+HAND = np.stack([np.arange(21) * 10.0, np.arange(21) * 5.0], axis=1) + 100
+
+
+def feed(confirmer, votes, start=0, offsets=None, confidence=1.0):
+    """
+    :param votes: Gesture of each frame
+    :param offsets: Per frame (x, y) shift of the hand in pixels
+    :return: Frame index and gesture of every confirmation
+    """
+    confirmed = []
+    for i, gesture in enumerate(votes):
+        landmarks = HAND if offsets is None else HAND + offsets[i]
+        result = confirmer.update(gesture, (start + i) / FPS, landmarks, confidence)
+        if result:
+            confirmed.append((start + i, result))
+    return confirmed
+
+
+def test_steady_hand_confirms_in_a_few_frames():
+    confirmed = feed(GestureConfirmer(), ['a'] * 10)
+    assert confirmed[0] == (4, 'a')
+
+
+def test_moving_hand_confirms_later():
+    rng = np.random.default_rng(0)
+    # About one hand size (200 px) per second
+    offsets = np.cumsum(rng.choice([-1, 1], (60, 2)) * 200 / FPS / np.sqrt(2), axis=0)
+    confirmed = feed(GestureConfirmer(), ['a'] * 60, offsets=offsets)
+    assert confirmed and confirmed[0][1] == 'a'
+    assert confirmed[0][0] > 4
+
+
+def test_fast_hand_never_confirms():
+    offsets = np.zeros((60, 2))
+    offsets[:, 0] = np.arange(60) * 3 * 200 / FPS
+    assert feed(GestureConfirmer(), ['a'] * 60, offsets=offsets) == []
+
+
+def test_flicker_delays_the_confirmation():
+    votes = ['a', 'a', 'b'] * 10
+    confirmed = feed(GestureConfirmer(), votes)
+    assert confirmed[0][1] == 'a'
+    assert confirmed[0][0] > 4
+    assert all(gesture == 'a' for _, gesture in confirmed)
+
+
+def test_no_gesture_starts_over():
+    confirmer = GestureConfirmer()
+    assert feed(confirmer, ['a', 'a', 'a', None, 'a', 'a', 'a']) == []
+    assert not feed(confirmer, [None])
+    assert not confirmer.confirming
+
+
+def test_repeat_confirms_a_held_gesture_again():
+    frames = [frame for frame, _ in feed(GestureConfirmer(), ['a'] * 20)]
+    assert frames[:3] == [4, 8, 12]
+    assert len(frames) == 4
+
+
+def test_held_gesture_is_ignored_without_repeat():
+    confirmer = GestureConfirmer(repeat=False)
+    assert feed(confirmer, ['a'] * 5) == [(4, 'a')]
+    states = []
+    for i in range(5, 60):
+        assert confirmer.update('a', i / FPS, HAND) is None
+        states.append(confirmer.confirming)
+    assert not any(states)
+
+
+def test_released_by_another_gesture_or_none():
+    confirmer = GestureConfirmer(repeat=False)
+    feed(confirmer, ['a'] * 5)
+    # A single frame of another gesture, never confirmed, lets "a" count again
+    assert feed(confirmer, ['b'] + ['a'] * 6, start=5)[0][1] == 'a'
+    feed(confirmer, ['a'] * 10, start=20)
+    assert feed(confirmer, [None] + ['a'] * 6, start=30)[0][1] == 'a'
+
+
+def test_reset_releases_the_gesture():
+    confirmer = GestureConfirmer(repeat=False)
+    feed(confirmer, ['a'] * 5)
+    confirmer.reset()
+    assert feed(confirmer, ['a'] * 6, start=5)[0][1] == 'a'
+
+
+def test_votes_below_min_confidence_count_as_no_gesture():
+    confirmer = GestureConfirmer(min_confidence=0.7)
+    assert feed(confirmer, ['a'] * 30, confidence=0.6) == []
+    assert not confirmer.confirming
+    # A confident vote counts less the lower its confidence
+    assert feed(GestureConfirmer(min_confidence=0.7), ['a'] * 30, confidence=0.8)[0][0] > 4
+
+
+def test_min_dwell_holds_at_high_frame_rates():
+    confirmer = GestureConfirmer(min_dwell=0.1)
+    times = np.arange(40) / 240
+    confirmed = [t for t in times if confirmer.update('a', t, HAND)]
+    assert confirmed[0] >= 0.1
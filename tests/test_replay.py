@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pytest
+
+from quiz_store import Question
+from replay import (LandmarkRecorder, load_recording, VirtualClock, ReplayDetector, ActionLog,
+                    replay, replay_presentation)
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def test_recorder_round_trip(tmp_path):
+    path = str(tmp_path / 'recording.npy')
+    recorder = LandmarkRecorder(path, chunk_size=2)
+    hands = np.arange(2 * 21 * 3).reshape(2, 21, 3)
+    for i in range(5):
+        recorder.record(hands[:i % 3], ['Left', 'Right'][:i % 3], [0.9, 0.8][:i % 3], 640, 480,
+                        timestamp=10 + i / 30)
+    assert recorder.close() == path
+
+    frames = load_recording(path)
+    assert isinstance(frames, np.memmap)
+    assert frames['numHands'].tolist() == [0, 1, 2, 0, 1]
+    assert frames['timestamp'][0] == 0
+    assert frames['timestamp'][4] == pytest.approx(4 / 30)
+    assert frames['types'][2].tolist() == [0, 1]
+    np.testing.assert_array_equal(frames['landmarks'][2], hands)
+
+
+def test_recorder_writes_nothing_without_frames(tmp_path):
+    path = str(tmp_path / 'recording.npy')
+    assert LandmarkRecorder(path).close() is None
+    assert not os.path.exists(path)
+
+
+def test_load_recording_rejects_other_arrays(tmp_path):
+    path = str(tmp_path / 'other.npy')
+    np.save(path, np.zeros(3))
+    with pytest.raises(ValueError):
+        load_recording(path)
+
+
+def test_virtual_clock():
+    clock = VirtualClock(1.5)
+    assert clock() == 1.5
+    clock.set(2)
+    assert clock() == 2.0
+
+
+def test_replay_detector_returns_the_recorded_hands():
+    frames = load_recording(os.path.join(FIXTURES, 'quiz.npy'))
+    detector = ReplayDetector(frames)
+    detector.seek(0)
+    assert detector.findHands(None)[0] == []
+    detector.seek(len(frames) - 20)
+    hands, _ = detector.findHands(None)
+    np.testing.assert_array_equal(hands[0]['lmList'], frames['landmarks'][len(frames) - 20, 0])
+    assert hands[0]['type'] == 'Right'
+    assert detector.tipsUp(hands[0]) == [0, 1, 1, 1, 1]
+
+
+def test_action_log():
+    clock = VirtualClock(1)
+    log = ActionLog(clock)
+    log.position = (3, 4)
+    clock.set(2)
+    log.click('left', 1)
+    log.press('b')
+    assert log.position == (3, 4)
+    assert log.actions == [(1.0, 'move', (3, 4)), (2.0, 'left_click', 1), (2.0, 'press', 'b')]
+
+
+def replay_quiz(recording, answers):
+    """
+    :return: The quiz after replaying the recording, the (time, question) it moved to and the scores it finished with
+    """
+    import composite
+
+    frames = load_recording(os.path.join(FIXTURES, recording))
+    clock = VirtualClock(frames['timestamp'][0])
+    quiz = composite.Quiz(clock=clock)
+    quiz.detector = ReplayDetector(frames)
+    quiz.quiz_name = 'fixture'
+    quiz.questions = tuple(Question(['', '', 'text', answer, 'a', 'b', 'c', 'd']) for answer in answers)
+    quiz.qTotal = len(quiz.questions)
+    quiz.chosen_answers = [None] * quiz.qTotal
+    questions, finished = [], []
+    quiz.question_signal.connect(lambda qNo: questions.append((round(clock(), 2), qNo)))
+    quiz.finish_signal.connect(lambda name, score, hands_unseen: finished.append(score))
+
+    replay(frames, quiz, clock)
+    return quiz, questions, finished
+
+
+def test_quiz_replay_answers_every_question():
+    quiz, questions, finished = replay_quiz('quiz.npy', range(1, 5))
+    assert [qNo for _, qNo in questions] == [1, 2, 3]
+    assert quiz.chosen_answers == [1, 2, 3, 4]
+    assert finished == [100.0]
+    # Each answer is held from 1 s + 1.3 s per question on, a steady hand confirms within a quarter second
+    for (time, qNo) in questions:
+        assert 0 < time - (1.0 + 1.3 * (qNo - 1)) < 0.25
+
+
+def test_quiz_replay_answers_the_same_value_twice_in_a_row():
+    # The hand is lowered during the cooldown after each answer and raised again before it ends
+    quiz, questions, finished = replay_quiz('quiz_repeat.npy', [2, 2, 2])
+    assert quiz.chosen_answers == [2, 2, 2]
+    assert finished == [100.0]
+
+
+def test_presentation_replay_actions():
+    result = replay_presentation(os.path.join(FIXTURES, 'presentation.npy'))
+    assert result['frames'] == 75
+    actions = result['actions']
+    assert actions['left_click'] == 1
+    assert actions['right_click'] == 1
+    assert actions['move'] > 10
+    assert set(actions) == {'move', 'left_click', 'right_click'}
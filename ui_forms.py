@@ -0,0 +1,86 @@
+"""
+Qt Designer forms compiled to Python classes.
+
+uic.loadUi parses the .ui XML and builds the widgets by reflection every
+time a screen is constructed. Instead, each form is compiled once with
+uic.compileUi into ui/generated, and compiled again whenever its .ui file
+is newer than the generated module. Screens use the form as a mixin:
+
+    class QuizMenu(QWidget, ui_form('quiz_menu')):
+        def __init__(self):
+            super().__init__()
+            self.setupUi(self)
+
+Compile every form ahead of time, e.g. when packaging, with:
+    python ui_forms.py [--force]
+"""
+
+import importlib.util
+import os
+import sys
+
+from PyQt5 import uic
+
+
+UI_DIR = 'ui'
+GENERATED_DIR = os.path.join(UI_DIR, 'generated')
+
+_forms = {}
+
+
+def ui_path(name):
+    return os.path.join(UI_DIR, f'{name}.ui')
+
+
+def module_path(name):
+    return os.path.join(GENERATED_DIR, f'ui_{name}.py')
+
+
+def is_stale(name):
+    """
+    :return: True if the generated module is missing or older than the .ui file
+    """
+    try:
+        return os.path.getmtime(module_path(name)) < os.path.getmtime(ui_path(name))
+    except OSError:
+        return True
+
+
+def compile_form(name):
+    os.makedirs(GENERATED_DIR, exist_ok=True)
+    path = module_path(name)
+    # Write to a temporary file so a failed compile never leaves a broken module behind
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        uic.compileUi(ui_path(name), file)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def ui_form(name):
+    """
+    :param name: Name of the .ui file in UI_DIR, without the extension
+    :return: The generated Ui_ class, compiled first if it is stale
+    """
+    form = _forms.get(name)
+    if form is None:
+        if is_stale(name):
+            compile_form(name)
+        spec = importlib.util.spec_from_file_location(f'ui_{name}', module_path(name))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        form = _forms[name] = next(value for key, value in vars(module).items() if key.startswith('Ui_'))
+    return form
+
+
+def compile_all(force=False):
+    """
+    Compiles every stale form in UI_DIR, or all of them with force.
+    """
+    for file in sorted(os.listdir(UI_DIR)):
+        name, extension = os.path.splitext(file)
+        if extension == '.ui' and (force or is_stale(name)):
+            print(compile_form(name))
+
+
+if __name__ == "__main__":
+    compile_all(force='--force' in sys.argv)